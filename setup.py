@@ -0,0 +1,27 @@
+"""
+Builds the optional C threat kernel (utils/_threat_c.pyx) in place:
+
+    python setup.py build_ext --inplace
+
+Everything runs without it; compute_directional_threat then falls back to
+the numba or NumPy kernel. Without Cython installed no extension is built.
+"""
+from setuptools import setup, Extension
+
+try:
+    from Cython.Build import cythonize
+except ImportError:  # Cython is optional, the C kernel is skipped without it
+    cythonize = None
+
+ext_modules = []
+if cythonize is not None:
+    ext_modules = cythonize(
+        [Extension("utils._threat_c", ["utils/_threat_c.pyx"],
+                   extra_compile_args=["-O3", "-ffast-math", "-march=native"])],
+    )
+
+setup(
+    name="asteroid_arcade_game",
+    py_modules=[],
+    ext_modules=ext_modules,
+)
@@ -0,0 +1,59 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+"""
+C build of encoding._threat_kernel (same arguments, same math). Optional:
+compile it with `python setup.py build_ext --inplace`; without it
+compute_directional_threat uses the numba or NumPy kernel.
+"""
+from libc.math cimport sqrt, fabs
+
+cdef double _INV_SPEED_SCALE = 1.0 / 200.0  # 1 / encoding.SPEED_SCALE
+
+
+def threat_kernel(const double[::1] ast_x, const double[::1] ast_y,
+                  const double[::1] ast_vx, const double[::1] ast_vy,
+                  const double[::1] ast_size,
+                  double ship_x, double ship_y, double ship_vx, double ship_vy,
+                  double cos_h, double sin_h,
+                  double max_dist, double max_size, double cos_center,
+                  double w_dist, double w_speed, double w_size):
+    cdef double threat_left = 0.0
+    cdef double threat_center = 0.0
+    cdef double threat_right = 0.0
+    cdef double max_dist_sq = max_dist * max_dist
+    cdef double inv_max_dist = 1.0 / max_dist
+    cdef double inv_max_size = 1.0 / max_size if max_size > 0.0 else 0.0
+    cdef double rel_x, rel_y, dist_sq, distance, closing_speed, raw_threat, per_asteroid_threat
+    cdef double dist_component, speed_component, size_component
+    cdef double forward, side, is_center, is_left, is_right
+    cdef Py_ssize_t i
+
+    for i in range(ast_x.shape[0]):
+        rel_x = ast_x[i] - ship_x
+        rel_y = ast_y[i] - ship_y
+        if fabs(rel_x) > max_dist or fabs(rel_y) > max_dist:
+            continue
+        dist_sq = rel_x * rel_x + rel_y * rel_y
+        if dist_sq == 0.0 or dist_sq > max_dist_sq:
+            continue
+        distance = sqrt(dist_sq)
+
+        dist_component = max(0.0, 1.0 - distance * inv_max_dist)
+
+        closing_speed = -((ast_vx[i] - ship_vx) * rel_x + (ast_vy[i] - ship_vy) * rel_y) / distance
+        speed_component = min(1.0, closing_speed * _INV_SPEED_SCALE) if closing_speed > 0.0 else 0.0
+
+        size_component = min(1.0, ast_size[i] * inv_max_size) if max_size > 0.0 else 0.0
+
+        raw_threat = w_dist * dist_component + w_speed * speed_component + w_size * size_component
+        per_asteroid_threat = max(0.0, min(1.0, raw_threat))
+
+        forward = rel_x * cos_h + rel_y * sin_h
+        side = rel_y * cos_h - rel_x * sin_h
+        is_center = 1.0 if forward >= cos_center * distance else 0.0
+        is_left = (1.0 - is_center) * (1.0 if side > 0.0 else 0.0)
+        is_right = 1.0 - is_center - is_left
+        threat_right = max(threat_right, per_asteroid_threat * is_right)
+        threat_left = max(threat_left, per_asteroid_threat * is_left)
+        threat_center = max(threat_center, per_asteroid_threat * is_center)
+
+    return threat_left, threat_center, threat_right
@@ -5,13 +5,17 @@ from enum import Enum, auto
 from typing import List, Tuple
 
 from utils.encoding import compute_directional_threat
-from utils.game_physics import WORLD_WIDTH, WORLD_HEIGHT, DT, GameState
-from utils.encoding import Ship, Asteroid, Bullet, Threat, StimFreqs
+from utils.game_physics import WORLD_WIDTH, WORLD_HEIGHT, DT, MAX_BULLETS, BULLET_MAX_AGE_S, GameState, BatchedGameState
+from utils.game_physics import array_module, to_numpy
+from utils.game_physics import Ship, Asteroid, Bullet
+from utils.encoding import Threat, StimFreqs
 from utils.encoding import  map_threat_to_stim_freqs
-from utils.decoding import  Action, NeuralDecoder
-from utils.spikes_simulate import FiringCounts, simulate_step_firing_counts
+from utils.decoding import  Action, Heading, NeuralDecoder
+from utils.spikes_simulate import FiringCounts, simulate_step_firing_counts, simulate_step_firing_counts_batched
 from utils.feedback import FeedbackState, FeedbackMode, FeedbackType, step_feedback, FEEDBACK_MODE_DEFAULT
+from utils.feedback import step_feedback_batched
 from utils.game_physics import update_game_state
+from utils.fused_tick import fused_update_game_state_batched
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 
@@ -29,9 +33,10 @@ def make_initial_state() -> GameState:
 
 def run_simulation(num_steps: int, 
                    game_state: GameState = None,
-                   feedback_mode_str: str = FEEDBACK_MODE_DEFAULT):
+                   feedback_mode_str: str = FEEDBACK_MODE_DEFAULT,
+                   verbose: bool = False):
     """ Run the closed-loop simulation with optional feedback mode and initial game state.
-    Prints out the state at each step."""
+    With verbose=True, prints out the state at each step."""
     
     feedback_mode = FeedbackMode[feedback_mode_str]
     state = make_initial_state() if game_state is None else game_state
@@ -39,41 +44,43 @@ def run_simulation(num_steps: int,
     fb_state = FeedbackState()
     sensory_pause_remaining = 0.0
 
-    max_size = max(a.size for a in state.asteroids)
-
     for step in range(num_steps):
-        print(f"\n=== STEP {step}, t={state.t_s:.3f} s ===")
+        if verbose:
+            print(f"\n=== STEP {step}, t={state.t_s:.3f} s ===")
 
         # Encoding: threat -> stim freqs (if not paused) 
         if sensory_pause_remaining <= 0.0:
-            threat = compute_directional_threat(ship=state.ship,asteroids=state.asteroids,max_size=max_size)
+            threat = compute_directional_threat(ship=state.ship,asteroids=state.asteroids,max_size=state.max_asteroid_size)
             stim_freqs = map_threat_to_stim_freqs(threat)
-            print("Threat:", threat)
-            print("Stim freqs:", stim_freqs)
-        else:
+            if verbose:
+                print(f"Threat: left={threat.left:.2f}, center={threat.center:.2f}, right={threat.right:.2f}")
+                print("Stim freqs:", stim_freqs)
+        elif verbose:
             print(f"Sensory encoding PAUSED for {sensory_pause_remaining:.3f} s")
 
         # Simulated spikes from BNN for this 10 ms 
         spike_counts = simulate_step_firing_counts(bin_duration_s=DT)
-        print("Firing counts:", spike_counts)
 
         # Decode -> Action 
         t_bin_end = state.t_s + DT
         action = decoder.step(spike_counts, t_bin_end)
-        print("Action:", action)
 
         # Physics + hit/kill detection 
         hit, kill = update_game_state(state, action, DT)
-        print("Hit:", hit, "Kill:", kill)
-        print(
-            f"Ship: x={state.ship.x:.1f}, y={state.ship.y:.1f}, "
-            f"vx={state.ship.vx:.1f}, vy={state.ship.vy:.1f}, "
-            f"heading_deg={math.degrees(state.ship.heading):.1f}"
-        )
 
         # Feedback 
         fb_type, pause_s, reset_game = step_feedback(feedback_mode, fb_state, hit, kill, DT)
-        print("Feedback:", fb_type, "pause_sensory:", pause_s, "reset_game:", reset_game)
+
+        if verbose:
+            print("Firing counts:", spike_counts)
+            print("Action:", action)
+            print("Hit:", hit, "Kill:", kill)
+            print(
+                f"Ship: x={state.ship.x:.1f}, y={state.ship.y:.1f}, "
+                f"vx={state.ship.vx:.1f}, vy={state.ship.vy:.1f}, "
+                f"heading_deg={math.degrees(state.ship.heading):.1f}"
+            )
+            print("Feedback:", fb_type, "pause_sensory:", pause_s, "reset_game:", reset_game)
 
         # In real experiment, here you'd trigger reward/punishment stimulation
         # based on fb_type, we just manage the sensory pause + resets.
@@ -82,9 +89,9 @@ def run_simulation(num_steps: int,
             sensory_pause_remaining = pause_s
 
         if reset_game:
-            print(">>> GAME RESET due to punishment")
+            if verbose:
+                print(">>> GAME RESET due to punishment")
             state = make_initial_state() if state is None else state
-            max_size = max(a.size for a in state.asteroids)
 
         # decrease pause timer
         if sensory_pause_remaining > 0.0:
@@ -93,9 +100,57 @@ def run_simulation(num_steps: int,
 
 
 
+def run_simulation_batched(batch: int,
+                           num_steps: int,
+                           game_state: GameState = None,
+                           feedback_mode_str: str = FEEDBACK_MODE_DEFAULT,
+                           backend: str = "numpy"):
+    """ Run `batch` independent closed-loop games in lockstep, all starting
+    from the same initial game state, with every step computed on arrays
+    over the batch axis. Games that receive punishment are reset to the
+    initial state.
+    backend="cupy" keeps the game state and the threat computation on the
+    GPU; spikes, decoding and feedback stay on the CPU.
+    Returns (state, n_hits, n_kills): the final BatchedGameState (on the
+    chosen backend) and the per-game (B,) hit / kill counts."""
+
+    feedback_mode = FeedbackMode[feedback_mode_str]
+    game_state = make_initial_state() if game_state is None else game_state
+    initial = BatchedGameState.from_states([game_state] * batch).to_backend(backend)
+    state = initial.copy()
+    xp = array_module(state.ship_x)
+    decoder = NeuralDecoder()
+    fb_state = FeedbackState(survival_timer_s=np.zeros(batch))
+
+    max_size = xp.full(batch, game_state.max_asteroid_size)
+    n_hits = np.zeros(batch, dtype=int)
+    n_kills = np.zeros(batch, dtype=int)
+
+    for step in range(num_steps):
+        # Simulated spikes -> actions
+        spike_counts = simulate_step_firing_counts_batched(batch, bin_duration_s=DT)
+        heading_code, thrust_on, shoot = decoder.step_batched(spike_counts, state.t_s + DT)
+
+        # Physics + hit/kill detection (the threats are not delivered:
+        # spikes are simulated independently of the stimulation)
+        hit, kill, _ = fused_update_game_state_batched(
+            state, xp.asarray(heading_code), xp.asarray(thrust_on), xp.asarray(shoot), DT, max_size)
+        hit, kill = to_numpy(hit), to_numpy(kill)
+        n_hits += hit
+        n_kills += kill
+
+        # Feedback: only the game resets matter here, there is no sensory
+        # stimulation to pause
+        _, _, reset_game = step_feedback_batched(feedback_mode, fb_state, hit, kill, DT)
+        state.reset(reset_game, initial)
+        if kill.any() or reset_game.any():
+            max_size = state.max_asteroid_size()
+
+    return state, n_hits, n_kills
+
+
 ### === VISUALIZATION / RECORDING  =====
 
-from copy import deepcopy
 from typing import Optional
 
 @dataclass
@@ -114,14 +169,91 @@ class StepRecord:
     sensory_pause_remaining: float
 
 
+@dataclass
+class SimulationHistory:
+    """
+    Per-step snapshots of a run, stored in preallocated arrays (S = number
+    of steps). `history[i]` rebuilds the StepRecord of step i, so the
+    game dataclasses are only created at visualization time.
+    """
+    t_s: np.ndarray            # (S,)
+    ship: np.ndarray           # (S, 5): x, y, vx, vy, heading
+    asteroids: np.ndarray      # (S, max_A, 5): x, y, vx, vy, size
+    n_asteroids: np.ndarray    # (S,) valid rows of `asteroids`
+    bullets: np.ndarray        # (S, max_B, 5): x, y, vx, vy, age_s
+    n_bullets: np.ndarray      # (S,) valid rows of `bullets`
+    threat: np.ndarray         # (S, 3): left, center, right (NaN while paused)
+    stim_freqs: np.ndarray     # (S, 3): left, center, right Hz (NaN while paused)
+    counts: np.ndarray         # (S, 4): left, right, thrust, shoot
+    heading_code: np.ndarray   # (S,) -1 (LEFT), 0 (NONE), +1 (RIGHT)
+    thrust_on: np.ndarray      # (S,)
+    shoot: np.ndarray          # (S,)
+    hit: np.ndarray            # (S,)
+    kill: np.ndarray           # (S,)
+    feedback_type: np.ndarray  # (S,) FeedbackType values
+    sensory_pause_remaining: np.ndarray  # (S,)
+
+    @classmethod
+    def empty(cls, num_steps: int, max_asteroids: int, max_bullets: int) -> "SimulationHistory":
+        return cls(
+            t_s=np.zeros(num_steps),
+            ship=np.zeros((num_steps, 5)),
+            asteroids=np.zeros((num_steps, max_asteroids, 5)),
+            n_asteroids=np.zeros(num_steps, dtype=int),
+            bullets=np.zeros((num_steps, max_bullets, 5)),
+            n_bullets=np.zeros(num_steps, dtype=int),
+            threat=np.full((num_steps, 3), np.nan),
+            stim_freqs=np.full((num_steps, 3), np.nan),
+            counts=np.zeros((num_steps, 4), dtype=int),
+            heading_code=np.zeros(num_steps, dtype=np.int8),
+            thrust_on=np.zeros(num_steps, dtype=bool),
+            shoot=np.zeros(num_steps, dtype=bool),
+            hit=np.zeros(num_steps, dtype=bool),
+            kill=np.zeros(num_steps, dtype=bool),
+            feedback_type=np.zeros(num_steps, dtype=int),
+            sensory_pause_remaining=np.zeros(num_steps),
+        )
+
+    def __len__(self) -> int:
+        return len(self.t_s)
+
+    def __getitem__(self, i: int) -> StepRecord:
+        paused = np.isnan(self.threat[i, 0])
+        return StepRecord(
+            t_s=float(self.t_s[i]),
+            ship=Ship(*self.ship[i].tolist()),
+            asteroids=[Asteroid(*row) for row in self.asteroids[i, :self.n_asteroids[i]].tolist()],
+            bullets=[Bullet(x, y, vx, vy, alive=True, expires_at=float(self.t_s[i] + BULLET_MAX_AGE_S - age))
+                     for x, y, vx, vy, age in self.bullets[i, :self.n_bullets[i]].tolist()],
+            threat=None if paused else Threat(*self.threat[i].tolist()),
+            stim_freqs=None if paused else StimFreqs(*(int(f) for f in self.stim_freqs[i])),
+            counts=FiringCounts(*self.counts[i].tolist()),
+            action=Action(heading=Heading(int(self.heading_code[i])),
+                          thrust_on=bool(self.thrust_on[i]), shoot=bool(self.shoot[i])),
+            hit=bool(self.hit[i]),
+            kill=bool(self.kill[i]),
+            feedback_type=FeedbackType(int(self.feedback_type[i])),
+            sensory_pause_remaining=float(self.sensory_pause_remaining[i]),
+        )
+
+
+def _ensure_rows(buf: np.ndarray, n: int) -> np.ndarray:
+    """Grow axis 1 of a (S, rows, fields) snapshot buffer to hold at least n rows."""
+    if n <= buf.shape[1]:
+        return buf
+    grown = np.zeros((buf.shape[0], max(n, 2 * buf.shape[1]), buf.shape[2]))
+    grown[:, :buf.shape[1]] = buf
+    return grown
+
+
 def run_simulation_record(
     num_steps: int = 200,
     state: GameState = None,
     feedback_mode_str: str = FEEDBACK_MODE_DEFAULT,
-) -> List[StepRecord]:
+) -> SimulationHistory:
     """
-    Run the closed-loop simulation and return a list of StepRecord objects,
-    one per 10 ms step, for visualization.
+    Run the closed-loop simulation and return a SimulationHistory with
+    one snapshot per 10 ms step, for visualization.
     """
     feedback_mode = FeedbackMode[feedback_mode_str]
     state = make_initial_state() if state is None else state
@@ -129,9 +261,8 @@ def run_simulation_record(
     fb_state = FeedbackState()
     sensory_pause_remaining = 0.0
 
-    max_size = max(a.size for a in state.asteroids)
-
-    history: List[StepRecord] = []
+    # Asteroids are never spawned, and at most one bullet is fired per step
+    history = SimulationHistory.empty(num_steps, len(state.asteroids), len(state.bullets) + MAX_BULLETS)
 
     for step in range(num_steps):
 
@@ -140,7 +271,7 @@ def run_simulation_record(
             threat = compute_directional_threat(
                 ship=state.ship,
                 asteroids=state.asteroids,
-                max_size=max_size,
+                max_size=state.max_asteroid_size,
             )
             stim_freqs = map_threat_to_stim_freqs(threat)
         else:
@@ -167,7 +298,6 @@ def run_simulation_record(
 
         if reset_game:
             state = make_initial_state() if state is None else state
-            max_size = max(a.size for a in state.asteroids)
 
         # Decrease remaining pause time
         if sensory_pause_remaining > 0.0:
@@ -175,22 +305,31 @@ def run_simulation_record(
                 0.0, sensory_pause_remaining - DT
             )
 
-        # 6. Store a snapshot (deepcopy to freeze state)
-        record = StepRecord(
-            t_s=state.t_s,
-            ship=deepcopy(state.ship),
-            asteroids=deepcopy(state.asteroids),
-            bullets=deepcopy(state.bullets),
-            threat=deepcopy(threat),
-            stim_freqs=deepcopy(stim_freqs),
-            counts=counts,
-            action=action,
-            hit=hit,
-            kill=kill,
-            feedback_type=fb_type,
-            sensory_pause_remaining=sensory_pause_remaining,
-        )
-        history.append(record)
+        # 6. Store a snapshot (copied into the preallocated arrays)
+        ship = state.ship
+        n_ast, n_bul = len(state.asteroids), len(state.bullets)
+        history.asteroids = _ensure_rows(history.asteroids, n_ast)
+        history.bullets = _ensure_rows(history.bullets, n_bul)
+
+        history.t_s[step] = state.t_s
+        history.ship[step] = (ship.x, ship.y, ship.vx, ship.vy, ship.heading)
+        if n_ast:
+            history.asteroids[step, :n_ast] = [(a.x, a.y, a.vx, a.vy, a.size) for a in state.asteroids]
+        history.n_asteroids[step] = n_ast
+        if n_bul:
+            history.bullets[step, :n_bul] = [(b.x, b.y, b.vx, b.vy, b.age_s(state.t_s)) for b in state.bullets]
+        history.n_bullets[step] = n_bul
+        if threat is not None:
+            history.threat[step] = (threat.left, threat.center, threat.right)
+            history.stim_freqs[step] = (stim_freqs.left_hz, stim_freqs.center_hz, stim_freqs.right_hz)
+        history.counts[step] = (counts.left, counts.right, counts.thrust, counts.shoot)
+        history.heading_code[step] = action.heading
+        history.thrust_on[step] = action.thrust_on
+        history.shoot[step] = action.shoot
+        history.hit[step] = hit
+        history.kill[step] = kill
+        history.feedback_type[step] = fb_type.value
+        history.sensory_pause_remaining[step] = sensory_pause_remaining
 
     return history
 
@@ -215,7 +354,7 @@ def _draw_ship(ax, ship: Ship):
     ax.fill(pts_world[:,0], pts_world[:,1], edgecolor="blue", facecolor="blue", alpha=0.7, linewidth=1.0)
 
 
-def animate_history(history: List[StepRecord],
+def animate_history(history: SimulationHistory,
                     save_path: str | None = None,
                     fps: int = 30):
     """
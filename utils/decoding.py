@@ -1,15 +1,16 @@
 from dataclasses import dataclass
-from enum import Enum
-from typing import Optional
+from enum import IntEnum
+from typing import Optional, Tuple
+import numpy as np
 from utils.spikes_simulate import FiringCounts
 
-class Heading(Enum):
-    LEFT = "left"
-    RIGHT = "right"
-    NONE = "none"  # no turn
+class Heading(IntEnum):
+    # value = sign of the heading change, so arrays of codes map directly
+    LEFT = -1
+    RIGHT = 1
+    NONE = 0  # no turn
 
-
-@dataclass
+@dataclass(slots=True)
 class FiringRates:
     """
     Firing rates (spikes/s) for each decoding group, in one bin.
@@ -20,7 +21,7 @@ class FiringRates:
     shoot: float
 
 
-@dataclass
+@dataclass(slots=True)
 class DecodingConfig:
     """
     Thresholds and timing for decoding.
@@ -37,10 +38,10 @@ class DecodingConfig:
 
     # Shoot (fire) threshold + cooldown
     shoot_threshold: float = 2.0             # spikes/s
-    # shoot_cooldown_s: float = 0.150         # min time between shots in seconds
+    shoot_cooldown_s: float = 0.0            # min time between shots in seconds (0 = disabled, e.g. 0.150)
 
 
-@dataclass
+@dataclass(slots=True)
 class Action:
     """
     Decoded action for one 10 ms time step.
@@ -49,8 +50,11 @@ class Action:
     thrust_on: bool      # True = accelerate
     shoot: bool          # True = fire a bullet
 
+    def copy(self) -> "Action":
+        return Action(heading=self.heading, thrust_on=self.thrust_on, shoot=self.shoot)
+
 
-@dataclass
+@dataclass(slots=True)
 class DecoderState:
     """
     Stateful info for the decoder (e.g., last shot time).
@@ -74,11 +78,13 @@ def counts_to_rates(counts: FiringCounts, cfg: DecodingConfig) -> FiringRates:
 class NeuralDecoder:
     """
     Decodes neural firing into game actions at each time step (bin).
+    The decode_* methods take scalar rates, decode_*_batched (B,) arrays.
     """
 
     def __init__(self, config: Optional[DecodingConfig] = None):
         self.cfg = config or DecodingConfig()
         self.state = DecoderState()
+        self._action = Action(heading=Heading.NONE, thrust_on=False, shoot=False)
 
 
     def decode_heading(self, r_left: float, r_right: float) -> Heading:
@@ -102,9 +108,10 @@ class NeuralDecoder:
             # Similar activity: don't twitch for tiny differences
             return Heading.NONE
 
-    def decode_thrust(self, r_thrust: float) -> bool:
+    def decode_thrust(self, r_thrust):
         """
         Binary decision for acceleration based on a single group.
+        Works on a scalar or a (B,) array of rates.
         """
         return r_thrust > self.cfg.thrust_threshold
 
@@ -119,25 +126,75 @@ class NeuralDecoder:
         if r_shoot <= cfg.shoot_threshold:
             return False
 
-        # # Check cooldown
-        # if (t_s - self.state.last_shot_time_s) < cfg.shoot_cooldown_s:
-        #     return False
+        # Check cooldown
+        if (t_s - self.state.last_shot_time_s) < cfg.shoot_cooldown_s:
+            return False
 
         # Approve a shot and update last_shot_time
         self.state.last_shot_time_s = t_s
         return True
 
+    def decode_heading_batched(self, r_left: np.ndarray, r_right: np.ndarray) -> np.ndarray:
+        """
+        decode_heading for (B,) arrays of rates.
+        Returns Heading values: -1 (LEFT), 0 (NONE) or +1 (RIGHT).
+        """
+        cfg = self.cfg
+        r_total = r_left + r_right
+        diff = r_left - r_right
+
+        # Not enough activity to bother turning, or similar activity on
+        # both sides: don't twitch for tiny differences
+        return np.where(r_total < cfg.heading_silence_threshold, Heading.NONE,
+               np.where(diff > cfg.heading_diff_threshold, Heading.LEFT,
+               np.where(diff < -cfg.heading_diff_threshold, Heading.RIGHT, Heading.NONE)))
+
+    def decode_shoot_batched(self, r_shoot: np.ndarray, t_s: float) -> np.ndarray:
+        """
+        decode_shoot for (B,) arrays of rates; state.last_shot_time_s
+        becomes a (B,) array.
+        """
+        cfg = self.cfg
+        last_shot_time_s = self.state.last_shot_time_s
+
+        # Basic threshold + cooldown
+        shoot = (r_shoot > cfg.shoot_threshold) & ((t_s - last_shot_time_s) >= cfg.shoot_cooldown_s)
+
+        # Update last_shot_time for the approved shots
+        self.state.last_shot_time_s = np.where(shoot, t_s, last_shot_time_s)
+        return shoot
+
     def step(self, counts: FiringCounts, t_s: float) -> Action:
         """
         Decode a single time-bin of spikes into an Action.
         counts: FiringCounts for this bin.
         t_s: absolute time (seconds) at the *end* of this bin.
+        The same Action instance is updated and returned on every call:
+        use action.copy() to keep it past the next step.
         """
-        rates = counts_to_rates(counts, self.cfg)
+        inv_dt = 1.0 / self.cfg.bin_duration_s
+
+        heading = self.decode_heading(counts.left * inv_dt, counts.right * inv_dt)
+        thrust_on = self.decode_thrust(counts.thrust * inv_dt)
+        shoot = self.decode_shoot(counts.shoot * inv_dt, t_s)
 
-        heading = self.decode_heading(rates.left, rates.right)
-        thrust_on = self.decode_thrust(rates.thrust)
-        shoot = self.decode_shoot(rates.shoot, t_s)
+        action = self._action
+        action.heading = heading
+        action.thrust_on = thrust_on
+        action.shoot = shoot
+        return action
 
-        return Action(heading=heading, thrust_on=thrust_on, shoot=shoot)
+    def step_batched(self, counts: np.ndarray, t_s: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Decode one time-bin for a batch of games.
+        counts: (B, 4) spike counts with columns (left, right, thrust, shoot).
+        t_s: absolute time (seconds) at the *end* of this bin.
+        Returns (heading_code, thrust_on, shoot) arrays of shape (B,), where
+        heading_code holds Heading values: -1 (LEFT), 0 (NONE) or +1 (RIGHT).
+        """
+        r_left, r_right, r_thrust, r_shoot = (counts * (1.0 / self.cfg.bin_duration_s)).T
 
+        heading_code = self.decode_heading_batched(r_left, r_right).astype(np.int8)
+        thrust_on = self.decode_thrust(r_thrust)
+        shoot = self.decode_shoot_batched(r_shoot, t_s)
+        return heading_code, thrust_on, shoot
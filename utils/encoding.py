@@ -1,21 +1,35 @@
 import math
-from typing import List, Dict, Tuple
+import numpy as np
+from functools import lru_cache
+from typing import Tuple
 from dataclasses import dataclass
-from utils.game_physics import Ship, Asteroid, Bullet
-from utils.game_physics import wrap_angle
+from utils.game_physics import Ship, Asteroid, BatchedGameState, array_module
+
+try:
+    from utils._threat_c import threat_kernel as _threat_c
+except ImportError:  # C build is optional, see setup.py
+    _threat_c = None
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional, the NumPy path is used without it
+    njit = None
 
 MAX_DISTANCE = 400.0  # for threat computation
+SPEED_SCALE = 200.0   # closing speed (units/s) that maps to full speed threat
+_INV_SPEED_SCALE = 1.0 / SPEED_SCALE
 
 F_MIN_Hz = 5.0 # minimum frequency for stimulation
 F_MAX_Hz = 50.0 # maximum frequency for stimulation
+THREAT_LUT_STEPS = 100  # threat -> Hz lookup table resolution (steps of 0.01)
 
-@dataclass
+@dataclass(slots=True)
 class Threat:
     left: float # Expected to be in [0, 1]
     center: float 
     right: float 
 
-@dataclass
+@dataclass(slots=True)
 class StimFreqs:
     left_hz: float  # in Hz
     center_hz: float  
@@ -23,6 +37,140 @@ class StimFreqs:
 
 
 
+def _asteroid_arrays(asteroids: list[Asteroid]) -> np.ndarray:
+    """
+    Pack asteroid fields into a (5, N) array of rows x, y, vx, vy, size,
+    so each field is a contiguous (N,) vector.
+    """
+    fields = [(a.x, a.y, a.vx, a.vy, a.size) for a in asteroids]
+    return np.ascontiguousarray(np.array(fields, dtype=float).reshape(-1, 5).T)
+
+
+def _threat_numpy(ast_x, ast_y, ast_vx, ast_vy, ast_size,
+                  ship_x, ship_y, ship_vx, ship_vy, cos_h, sin_h,
+                  max_dist, max_size, cos_center,
+                  w_dist, w_speed, w_size) -> Tuple[float, float, float]:
+    """
+    Vectorized threat over all asteroids at once.
+    Returns (threat_left, threat_center, threat_right).
+    """
+    # relative position to ship, with a cheap bounding-box cull first
+    rel_x = ast_x - ship_x
+    rel_y = ast_y - ship_y
+    near = (np.abs(rel_x) <= max_dist) & (np.abs(rel_y) <= max_dist)
+    rel_x, rel_y = rel_x[near], rel_y[near]
+    ast_vx, ast_vy, ast_size = ast_vx[near], ast_vy[near], ast_size[near]
+    dist_sq = rel_x * rel_x + rel_y * rel_y
+
+    # Skip asteroids sitting exactly on the ship or too far away to matter,
+    # the sqrt is only taken for the survivors
+    valid = (dist_sq > 0.0) & (dist_sq <= max_dist * max_dist)
+    rel_x, rel_y = rel_x[valid], rel_y[valid]
+    ast_vx, ast_vy, ast_size = ast_vx[valid], ast_vy[valid], ast_size[valid]
+    distance = np.sqrt(dist_sq[valid])
+
+    # Distance component: linear falloff, 0 at max_dist, 1 at distance=0
+    inv_max_dist = 1.0 / max_dist
+    dist_component = np.clip(1.0 - distance * inv_max_dist, 0.0, 1.0)
+
+    # Speed component: relative velocity projected onto line-of-sight
+    # (ship -> asteroid). Negative dot product means "moving toward ship",
+    # hence minus sign; receding asteroids are clipped to 0
+    closing_speed = -((ast_vx - ship_vx) * rel_x + (ast_vy - ship_vy) * rel_y) / distance
+    speed_component = np.clip(closing_speed * _INV_SPEED_SCALE, 0.0, 1.0)
+
+    # Size component: max_size -> 1.0, smaller sizes scale linearly down to 0
+    if max_size > 0:
+        size_component = np.minimum(1.0, ast_size * (1.0 / max_size))
+    else:
+        size_component = np.zeros_like(ast_size)
+
+    # Combine components into a single per-asteroid threat
+    raw_threat = w_dist * dist_component + w_speed * speed_component + w_size * size_component
+    per_asteroid_threat = np.clip(raw_threat, 0.0, 1.0)
+
+    # Direction to each asteroid in the ship frame: forward = cos, side = sin
+    # of the relative angle (times distance), so no atan2 is needed
+    forward = rel_x * cos_h + rel_y * sin_h
+    side = rel_y * cos_h - rel_x * sin_h
+
+    # Put threat into left / center / right sector based on relative angle:
+    # one (3, N) mask and a single max-reduction, no per-asteroid branching
+    is_center = forward >= cos_center * distance
+    is_left = ~is_center & (side > 0.0)
+    is_right = ~(is_center | is_left)
+    sector_masks = np.stack([is_left, is_center, is_right])
+
+    per_sector = np.where(sector_masks, per_asteroid_threat, 0.0)
+    threat_left, threat_center, threat_right = per_sector.max(axis=1, initial=0.0)
+    return float(threat_left), float(threat_center), float(threat_right)
+
+
+def _threat_kernel(ast_x, ast_y, ast_vx, ast_vy, ast_size,
+                   ship_x, ship_y, ship_vx, ship_vy, cos_h, sin_h,
+                   max_dist, max_size, cos_center,
+                   w_dist, w_speed, w_size):
+    """
+    Same math as _threat_numpy, written as a single fused loop with no
+    temporary arrays. Compiled with numba when it is available.
+    """
+    threat_left = 0.0
+    threat_center = 0.0
+    threat_right = 0.0
+    max_dist_sq = max_dist * max_dist
+    inv_max_dist = 1.0 / max_dist
+    inv_max_size = 1.0 / max_size if max_size > 0.0 else 0.0
+
+    for i in range(ast_x.shape[0]):
+        rel_x = ast_x[i] - ship_x
+        rel_y = ast_y[i] - ship_y
+        if abs(rel_x) > max_dist or abs(rel_y) > max_dist:
+            continue
+        dist_sq = rel_x * rel_x + rel_y * rel_y
+        if dist_sq == 0.0 or dist_sq > max_dist_sq:
+            continue
+        distance = math.sqrt(dist_sq)
+
+        dist_component = max(0.0, 1.0 - distance * inv_max_dist)
+
+        closing_speed = -((ast_vx[i] - ship_vx) * rel_x + (ast_vy[i] - ship_vy) * rel_y) / distance
+        speed_component = min(1.0, closing_speed * _INV_SPEED_SCALE) if closing_speed > 0.0 else 0.0
+
+        size_component = min(1.0, ast_size[i] * inv_max_size) if max_size > 0.0 else 0.0
+
+        raw_threat = w_dist * dist_component + w_speed * speed_component + w_size * size_component
+        per_asteroid_threat = max(0.0, min(1.0, raw_threat))
+
+        # Branchless sector update: threats are >= 0, so a zeroed-out
+        # contribution never changes the max of the other sectors
+        forward = rel_x * cos_h + rel_y * sin_h
+        side = rel_y * cos_h - rel_x * sin_h
+        is_center = 1.0 * (forward >= cos_center * distance)
+        is_left = (1.0 - is_center) * (side > 0.0)
+        is_right = 1.0 - is_center - is_left
+        threat_right = max(threat_right, per_asteroid_threat * is_right)
+        threat_left = max(threat_left, per_asteroid_threat * is_left)
+        threat_center = max(threat_center, per_asteroid_threat * is_center)
+
+    return threat_left, threat_center, threat_right
+
+
+# Kernel used by compute_directional_threat: compiled C extension, then
+# numba, then NumPy, whichever is available first
+if _threat_c is not None:
+    _threat_fn = _threat_c
+elif njit is not None:
+    _threat_kernel = njit(cache=True, fastmath=True)(_threat_kernel)
+    # Pay the JIT cost once at import instead of on the first game step
+    _one = np.ones(1)
+    _threat_kernel(_one, _one, _one, _one, _one, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0,
+                   MAX_DISTANCE, 1.0, 0.98, 0.5, 0.3, 0.2)
+    del _one
+    _threat_fn = _threat_kernel
+else:
+    _threat_fn = _threat_numpy
+
+
 def compute_directional_threat(
     ship: Ship,
     asteroids: list[Asteroid],
@@ -36,94 +184,54 @@ def compute_directional_threat(
     """
     Compute maximum threat from left, center, right directions
     Returns Threat(left, center, right), each in [0, 1]
-    """
 
-    def distance_threat(distance: float) -> float:
-        """
-        Threat component based purely on distance.
-        Closer asteroid → value closer to 1. At max_dist → 0.
-        """
-        if distance >= max_dist:
-            return 0.0
-        # linear falloff: 0 at max_dist, 1 at distance=0
-        return max(0.0, 1.0 - distance / max_dist)
-
-    def speed_threat(rel_vx: float,rel_vy: float,
-        unit_rx: float,unit_ry: float,
-        speed_scale: float = 200.0) -> float:
-        """
-        Threat component based on closing speed (how fast it is coming toward the ship).
-        Only approaching motion contributes (moving away → 0).
-        """
-        # Relative velocity projected onto line-of-sight (ship -> asteroid)
-        # Negative dot product means "moving toward ship", hence minus sign
-        closing_speed = -(rel_vx * unit_rx + rel_vy * unit_ry)
-
-        # Ignore receding asteroids
-        if closing_speed <= 0:
-            return 0.0
-        return min(1.0, closing_speed / speed_scale)
-
-    def size_threat(size: float) -> float:
-        """
-        Threat component based on asteroid size
-        max_size → 1.0, smaller sizes scale linearly down to 0
-        """
-        if max_size <= 0:
-            return 0.0
-        return min(1.0, size / max_size)
-
-
-    center_half_angle = math.radians(theta_center_deg)
-
-    threat_left = 0.0
-    threat_center = 0.0
-    threat_right = 0.0
-
-    for asteroid in asteroids:
-        # relative position & distance to ship
-        rel_x = asteroid.x - ship.x
-        rel_y = asteroid.y - ship.y
-        distance = math.hypot(rel_x, rel_y)  # distance ship <-> asteroid
-
-        # Skip if sitting exactly on the ship or too far away to matter
-        if distance == 0.0 or distance > max_dist:
-            continue
+    The per-asteroid threat is the weighted sum of:
+      - distance: closer asteroid -> closer to 1, at max_dist -> 0
+      - speed: closing speed toward the ship / SPEED_SCALE (receding -> 0)
+      - size: size / max_size, capped at 1
+    Uses the C extension when built, else the numba kernel when numba is
+    installed, else NumPy.
+    """
+    # Sector test by dot product against the heading: an asteroid is in the
+    # center sector iff cos(relative angle) >= cos(theta_center)
+    cos_h = math.cos(ship.heading)
+    sin_h = math.sin(ship.heading)
+    cos_center = math.cos(math.radians(theta_center_deg))
+    ast_x, ast_y, ast_vx, ast_vy, ast_size = _asteroid_arrays(asteroids)
 
-        # Unit vector from ship to asteroid
-        unit_rx = rel_x / distance
-        unit_ry = rel_y / distance
+    threat_left, threat_center, threat_right = _threat_fn(
+        ast_x, ast_y, ast_vx, ast_vy, ast_size,
+        float(ship.x), float(ship.y), float(ship.vx), float(ship.vy), cos_h, sin_h,
+        float(max_dist), float(max_size), cos_center,
+        float(w_dist), float(w_speed), float(w_size),
+    )
+    return Threat(left=threat_left, center=threat_center, right=threat_right)
 
-        abs_angle_to_asteroid = math.atan2(rel_y, rel_x)
-        rel_angle_to_asteroid = wrap_angle(abs_angle_to_asteroid - ship.heading)
+    
+        
+@lru_cache(maxsize=8)
+def _stim_freq_lut(f_min_hz: float, f_max_hz: float) -> Tuple[int, ...]:
+    """
+    Integer frequency (Hz) for each quantized threat 0.00, 0.01, ..., 1.00,
+    as Python ints so scalar lookups skip numpy scalar indexing.
+    """
+    threat_values = np.arange(THREAT_LUT_STEPS + 1) / THREAT_LUT_STEPS
+    return tuple(np.round(f_min_hz + threat_values * (f_max_hz - f_min_hz)).astype(int).tolist())
 
-        # Threat components 
-        dist_component = distance_threat(distance)
 
-        rel_vx = asteroid.vx - ship.vx
-        rel_vy = asteroid.vy - ship.vy
-        speed_component = speed_threat(rel_vx, rel_vy, unit_rx, unit_ry)
+@lru_cache(maxsize=8)
+def _stim_freq_lut_array(f_min_hz: float, f_max_hz: float) -> np.ndarray:
+    """ _stim_freq_lut as a read-only array, for the batched lookups."""
+    lut = np.array(_stim_freq_lut(f_min_hz, f_max_hz))
+    lut.setflags(write=False)
+    return lut
 
-        size_component = size_threat(asteroid.size)
 
-        # Combine components into a single per-asteroid threat 
-        raw_threat = (w_dist * dist_component + w_speed * speed_component+ w_size * size_component)
-        per_asteroid_threat = max(0.0, min(1.0, raw_threat))
+def _lut_index(threat_value: float) -> int:
+    # Rounds half up, like the batched index
+    return min(max(int(threat_value * THREAT_LUT_STEPS + 0.5), 0), THREAT_LUT_STEPS)
 
-        # Put threat into left / center / right sector based on relative angle
-        if rel_angle_to_asteroid < -center_half_angle:
-            threat_right = max(threat_right, per_asteroid_threat)
-        elif rel_angle_to_asteroid > center_half_angle:
-            threat_left = max(threat_left, per_asteroid_threat)
-        else:
-            threat_center = max(threat_center, per_asteroid_threat)
-    return Threat(
-        left=round(threat_left,2), 
-        center=round(threat_center,2), 
-        right=round(threat_right,2))
 
-    
-        
 def map_threat_to_stim_freqs(
     threat: Threat,
     f_min_hz: float = F_MIN_Hz,
@@ -132,12 +240,86 @@ def map_threat_to_stim_freqs(
     """
     Map threat values in [0, 1] to stimulation frequencies in [f_min_hz, f_max_hz].
     Higher threat → higher frequency.
+    Threats are quantized to 1 / THREAT_LUT_STEPS and looked up in a
+    precomputed table of integer Hz values.
     """
-    def map_value(threat_value: float) -> float:
-        return f_min_hz + threat_value * (f_max_hz - f_min_hz)
+    lut = _stim_freq_lut(f_min_hz, f_max_hz)
 
-    left_hz = round(map_value(threat.left))
-    center_hz = round(map_value(threat.center))
-    right_hz = round(map_value(threat.right))
+    left_hz = lut[_lut_index(threat.left)]
+    center_hz = lut[_lut_index(threat.center)]
+    right_hz = lut[_lut_index(threat.right)]
 
-    return StimFreqs(left_hz=left_hz, center_hz=center_hz, right_hz=right_hz)
\ No newline at end of file
+    return StimFreqs(left_hz=left_hz, center_hz=center_hz, right_hz=right_hz)
+
+
+def compute_directional_threat_batched(
+    state: BatchedGameState,
+    max_size: np.ndarray,
+    max_dist: float = MAX_DISTANCE,
+    theta_center_deg: float = 10.0,
+    w_dist: float = 0.5,
+    w_speed: float = 0.3,
+    w_size: float = 0.2,
+) -> np.ndarray:
+    """
+    compute_directional_threat for every game of a batch at once.
+    max_size: (B,) array (or scalar) of asteroid size normalizers.
+    Returns a (B, 3) array of (left, center, right) threats in [0, 1],
+    on the same device (numpy or cupy) as the state.
+    """
+    xp = array_module(state.ship_x)
+    if state.ast_x.shape[1] == 0:
+        return xp.zeros((state.batch_size, 3))
+    cos_h = xp.cos(state.ship_heading)[:, None]
+    sin_h = xp.sin(state.ship_heading)[:, None]
+    cos_center = math.cos(math.radians(theta_center_deg))
+    max_size = xp.broadcast_to(xp.asarray(max_size, dtype=float), state.ship_x.shape)[:, None]
+
+    # relative position & squared distance to ship, (B, A)
+    rel_x = state.ast_x - state.ship_x[:, None]
+    rel_y = state.ast_y - state.ship_y[:, None]
+    dist_sq = rel_x * rel_x + rel_y * rel_y
+    valid = state.ast_alive & (dist_sq > 0.0) & (dist_sq <= max_dist * max_dist)
+
+    # Invalid asteroids get a dummy distance of 1 to keep the math finite,
+    # their threat is masked out below
+    distance = xp.sqrt(xp.where(valid, dist_sq, 1.0))
+    dist_component = xp.clip(1.0 - distance * (1.0 / max_dist), 0.0, 1.0)
+
+    closing_speed = -((state.ast_vx - state.ship_vx[:, None]) * rel_x
+                      + (state.ast_vy - state.ship_vy[:, None]) * rel_y) / distance
+    speed_component = xp.clip(closing_speed * _INV_SPEED_SCALE, 0.0, 1.0)
+
+    safe_max_size = xp.where(max_size > 0, max_size, 1.0)
+    size_component = xp.where(max_size > 0, xp.minimum(1.0, state.ast_size / safe_max_size), 0.0)
+
+    raw_threat = w_dist * dist_component + w_speed * speed_component + w_size * size_component
+    per_asteroid_threat = xp.where(valid, xp.clip(raw_threat, 0.0, 1.0), 0.0)
+
+    forward = rel_x * cos_h + rel_y * sin_h
+    side = rel_y * cos_h - rel_x * sin_h
+    is_center = forward >= cos_center * distance
+    is_left = ~is_center & (side > 0.0)
+    is_right = ~(is_center | is_left)
+
+    threats = xp.stack([
+        xp.where(is_left, per_asteroid_threat, 0.0).max(axis=1),
+        xp.where(is_center, per_asteroid_threat, 0.0).max(axis=1),
+        xp.where(is_right, per_asteroid_threat, 0.0).max(axis=1),
+    ], axis=1)
+    return threats
+
+
+def map_threats_to_stim_freqs_batched(
+    threats: np.ndarray,
+    f_min_hz: float = F_MIN_Hz,
+    f_max_hz: float = F_MAX_Hz,
+) -> np.ndarray:
+    """
+    map_threat_to_stim_freqs for a (B, 3) threat array.
+    Returns a (B, 3) int array of (left, center, right) frequencies in Hz.
+    """
+    xp = array_module(threats)
+    # Round half up, like the scalar _lut_index (rint would round half to even)
+    index = xp.floor(xp.clip(threats, 0.0, 1.0) * THREAT_LUT_STEPS + 0.5).astype(np.intp)
+    return xp.take(xp.asarray(_stim_freq_lut_array(f_min_hz, f_max_hz)), index)
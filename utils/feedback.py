@@ -1,9 +1,8 @@
-from dataclasses import dataclass
-from typing import List, Tuple
+from dataclasses import dataclass, replace
+from typing import Tuple
 from enum import Enum, auto
-from dataclasses import replace
-import random
-from utils.stimulation import StimConfig, StimFreqs, generate_directional_trains
+from functools import lru_cache
+from utils.stimulation import StimConfig, StimFreqs, DirectionalWaveforms, generate_directional_trains
 import numpy as np
 
 # Choose feedback loop here:
@@ -11,7 +10,7 @@ import numpy as np
 #   FeedbackMode.LOOP2  -> adds survival reward
 FEEDBACK_MODE_DEFAULT = "LOOP1"  # change to "LOOP2" to switch
 
-@dataclass
+@dataclass(slots=True)
 class FeedbackState:
     survival_timer_s: float = 0.0
 
@@ -52,19 +51,8 @@ def step_feedback(
     """
     Returns (feedback_type, pause_sensory_s, reset_game).
     """
-    # Loop 1: hit -> punishment; kill -> reward; survival implicit
-    if mode == FeedbackMode.LOOP1:
-        if hit:
-            fb_state.survival_timer_s = 0.0
-            return FeedbackType.PUNISHMENT, punishment_total_pause_s, True
-        if kill:
-            fb_state.survival_timer_s = 0.0
-            return FeedbackType.KILL_REWARD, reward_pause_s, False
-
-        fb_state.survival_timer_s += dt
-        return FeedbackType.NONE, 0.0, False
-
-    # Loop 2: hit -> punishment; kill -> reward; survival reward after window
+    # Both loops: hit -> punishment; kill -> reward.
+    # Loop 2 adds a survival reward after each survival_threshold_s window.
     if hit:
         fb_state.survival_timer_s = 0.0
         return FeedbackType.PUNISHMENT, punishment_total_pause_s, True
@@ -74,7 +62,8 @@ def step_feedback(
         return FeedbackType.KILL_REWARD, reward_pause_s, False
 
     fb_state.survival_timer_s += dt
-    if fb_state.survival_timer_s >= survival_threshold_s:
+    enable_survival = mode == FeedbackMode.LOOP2
+    if enable_survival and fb_state.survival_timer_s >= survival_threshold_s:
         fb_state.survival_timer_s = 0.0
         return FeedbackType.SURVIVAL_REWARD, reward_pause_s, False
 
@@ -84,7 +73,7 @@ def step_feedback(
 def generate_feedback_trains(
     fb_type: FeedbackType,
     base_cfg: StimConfig,
-) -> tuple[StimFreqs, dict[str, np.ndarray], float, StimConfig]:
+) -> tuple[StimFreqs, DirectionalWaveforms, float, StimConfig]:
     """
     Generate stimulation trains for a feedback event, using the same
     directional stim infrastructure as sensory encoding.
@@ -93,10 +82,23 @@ def generate_feedback_trains(
         (stim_freqs, stim_trains, duration_s, cfg_used)
 
         stim_freqs : StimFreqs used for this feedback
-        stim_trains: dict with "left", "center", "right" waveform arrays
+        stim_trains: DirectionalWaveforms with left / center / right waveform arrays
         duration_s : duration of the feedback train
         cfg_used   : StimConfig actually used (may differ in amplitude)
+
+    The trains only depend on (fb_type, base_cfg) and are cached: the
+    returned StimFreqs and DirectionalWaveforms are fresh copies, but the
+    waveform arrays are shared and read-only, .copy() them to modify.
     """
+    stim_freqs, stim_trains, duration_s, cfg_used = _feedback_trains_cached(fb_type, base_cfg)
+    return replace(stim_freqs), replace(stim_trains), duration_s, cfg_used
+
+
+@lru_cache(maxsize=None)
+def _feedback_trains_cached(
+    fb_type: FeedbackType,
+    base_cfg: StimConfig,
+) -> tuple[StimFreqs, DirectionalWaveforms, float, StimConfig]:
     # Kill / survival reward: high-freq burst on all encoding electrodes 
     if fb_type in (FeedbackType.KILL_REWARD, FeedbackType.SURVIVAL_REWARD):
         duration_s = FEEDBACK_REWARD_DURATION_S
@@ -109,6 +111,7 @@ def generate_feedback_trains(
         )
 
         stim_trains = generate_directional_trains(stim_freqs, duration_s, cfg_used)
+        _set_read_only(stim_trains)
         return stim_freqs, stim_trains, duration_s, cfg_used
 
     # Punishment: low-freq, high-amp on a all encoding electrode 
@@ -122,7 +125,46 @@ def generate_feedback_trains(
 
         stim_freqs = StimFreqs(left_hz=left_hz,center_hz=center_hz,right_hz=right_hz)
         stim_trains = generate_directional_trains(stim_freqs, duration_s, cfg_used)
+        _set_read_only(stim_trains)
         return stim_freqs, stim_trains, duration_s, cfg_used
 
     else:
         raise ValueError(f"Unsupported feedback type for trains: {fb_type}")
+
+
+def _set_read_only(trains):
+    for waveform in (trains.left, trains.center, trains.right):
+        waveform.setflags(write=False)
+
+
+def step_feedback_batched(
+    mode: FeedbackMode,
+    fb_state: FeedbackState,
+    hit: np.ndarray,
+    kill: np.ndarray,
+    dt: float,
+    punishment_total_pause_s: float = 8.0,
+    reward_pause_s: float = 0.1,
+    survival_threshold_s: float = 1.0,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    step_feedback for a batch of games. fb_state.survival_timer_s is a (B,) array.
+    Returns (feedback_type, pause_sensory_s, reset_game) arrays of shape (B,),
+    feedback_type holding FeedbackType values.
+    """
+    event = hit | kill
+    timer = np.where(event, 0.0, fb_state.survival_timer_s + dt)
+
+    if mode == FeedbackMode.LOOP2:
+        survive = ~event & (timer >= survival_threshold_s)
+        timer = np.where(survive, 0.0, timer)
+    else:
+        survive = np.zeros_like(event)
+    fb_state.survival_timer_s = timer
+
+    fb_type = np.where(hit, FeedbackType.PUNISHMENT.value,
+              np.where(kill, FeedbackType.KILL_REWARD.value,
+              np.where(survive, FeedbackType.SURVIVAL_REWARD.value, FeedbackType.NONE.value)))
+    pause_s = np.where(hit, punishment_total_pause_s,
+              np.where(kill | survive, reward_pause_s, 0.0))
+    return fb_type, pause_s, hit.copy()
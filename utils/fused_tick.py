@@ -0,0 +1,200 @@
+import math
+import numpy as np
+from typing import Tuple
+
+from utils.game_physics import WORLD_WIDTH, WORLD_HEIGHT, SHIP_RADIUS, BULLET_RADIUS, BULLET_MAX_AGE_S
+from utils.game_physics import PI, TWO_PI, BatchedGameState, array_module, update_game_state_batched
+from utils.encoding import MAX_DISTANCE, _INV_SPEED_SCALE, compute_directional_threat_batched
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional, the NumPy path is used without it
+    njit = None
+
+
+def _fused_tick_kernel(ship_x, ship_y, ship_vx, ship_vy, ship_heading,
+                       ast_x, ast_y, ast_vx, ast_vy, ast_size, ast_alive,
+                       bullet_x, bullet_y, bullet_vx, bullet_vy, bullet_expires_at, bullet_alive,
+                       heading_code, thrust_on, shoot, t_s, dt, max_size,
+                       max_dist, cos_center, w_dist, w_speed, w_size,
+                       turn_rate_rad_s, thrust_accel, bullet_speed,
+                       threats, hit, kill):
+    """
+    One game step for every game of the batch: spawn bullet, move ship,
+    bullets and asteroids, detect hits / kills and compute the threat of
+    the updated state, with each asteroid read once and kept in registers
+    from the physics update to its threat contribution.
+    Updates the state arrays in place and writes threats (B, 3), hit (B,)
+    and kill (B,).
+    """
+    n_games, n_ast = ast_x.shape
+    n_bullets = bullet_x.shape[1]
+    max_dist_sq = max_dist * max_dist
+    inv_max_dist = 1.0 / max_dist
+    bullet_hit = np.zeros(n_bullets, dtype=np.bool_)
+    # Same bullet expiry rule as update_bullets, t_s being the game time
+    # at the start of the step
+    now_s = t_s + dt + 1e-6 * dt
+
+    for b in range(n_games):
+        # Bullet spawn, using the heading before this step's turn
+        if shoot[b]:
+            for j in range(n_bullets):
+                if not bullet_alive[b, j]:
+                    bullet_x[b, j] = ship_x[b]
+                    bullet_y[b, j] = ship_y[b]
+                    bullet_vx[b, j] = bullet_speed * math.cos(ship_heading[b])
+                    bullet_vy[b, j] = bullet_speed * math.sin(ship_heading[b])
+                    bullet_expires_at[b, j] = t_s + BULLET_MAX_AGE_S
+                    bullet_alive[b, j] = True
+                    break
+
+        # Ship
+        heading = ship_heading[b] + heading_code[b] * (turn_rate_rad_s * dt)
+        if not -PI <= heading < PI:
+            heading = (heading + PI) % TWO_PI - PI
+        cos_h = math.cos(heading)
+        sin_h = math.sin(heading)
+        if thrust_on[b]:
+            ship_vx[b] += (thrust_accel * dt) * cos_h
+            ship_vy[b] += (thrust_accel * dt) * sin_h
+        sx = (ship_x[b] + ship_vx[b] * dt) % WORLD_WIDTH
+        sy = (ship_y[b] + ship_vy[b] * dt) % WORLD_HEIGHT
+        svx = ship_vx[b]
+        svy = ship_vy[b]
+        ship_x[b] = sx
+        ship_y[b] = sy
+        ship_heading[b] = heading
+
+        # Bullets
+        for j in range(n_bullets):
+            bullet_hit[j] = False
+            if not bullet_alive[b, j]:
+                continue
+            bullet_x[b, j] = (bullet_x[b, j] + bullet_vx[b, j] * dt) % WORLD_WIDTH
+            bullet_y[b, j] = (bullet_y[b, j] + bullet_vy[b, j] * dt) % WORLD_HEIGHT
+            if now_s >= bullet_expires_at[b, j]:
+                bullet_alive[b, j] = False
+
+        # Asteroids: move, collide, then threat of the survivors
+        inv_max_size = 1.0 / max_size[b] if max_size[b] > 0.0 else 0.0
+        threat_left = 0.0
+        threat_center = 0.0
+        threat_right = 0.0
+        hit_b = False
+        kill_b = False
+        for i in range(n_ast):
+            if not ast_alive[b, i]:
+                continue
+            ax = (ast_x[b, i] + ast_vx[b, i] * dt) % WORLD_WIDTH
+            ay = (ast_y[b, i] + ast_vy[b, i] * dt) % WORLD_HEIGHT
+            ast_x[b, i] = ax
+            ast_y[b, i] = ay
+            size = ast_size[b, i]
+
+            rel_x = ax - sx
+            rel_y = ay - sy
+            dist_sq = rel_x * rel_x + rel_y * rel_y
+            reach = SHIP_RADIUS + size
+            if dist_sq <= reach * reach:
+                hit_b = True
+
+            # Same rule as detect_hits_and_kills_batched: every live bullet
+            # overlapping the asteroid is spent
+            reach = BULLET_RADIUS + size
+            for j in range(n_bullets):
+                if bullet_alive[b, j]:
+                    dx = bullet_x[b, j] - ax
+                    dy = bullet_y[b, j] - ay
+                    if dx * dx + dy * dy <= reach * reach:
+                        bullet_hit[j] = True
+                        ast_alive[b, i] = False
+            if not ast_alive[b, i]:
+                kill_b = True
+                continue
+
+            if abs(rel_x) > max_dist or abs(rel_y) > max_dist:
+                continue
+            if dist_sq == 0.0 or dist_sq > max_dist_sq:
+                continue
+            distance = math.sqrt(dist_sq)
+
+            dist_component = max(0.0, 1.0 - distance * inv_max_dist)
+            closing_speed = -((ast_vx[b, i] - svx) * rel_x + (ast_vy[b, i] - svy) * rel_y) / distance
+            speed_component = min(1.0, closing_speed * _INV_SPEED_SCALE) if closing_speed > 0.0 else 0.0
+            size_component = min(1.0, size * inv_max_size) if max_size[b] > 0.0 else 0.0
+            per_asteroid_threat = max(0.0, min(1.0, w_dist * dist_component
+                                               + w_speed * speed_component + w_size * size_component))
+
+            forward = rel_x * cos_h + rel_y * sin_h
+            side = rel_y * cos_h - rel_x * sin_h
+            is_center = 1.0 * (forward >= cos_center * distance)
+            is_left = (1.0 - is_center) * (side > 0.0)
+            is_right = 1.0 - is_center - is_left
+            threat_right = max(threat_right, per_asteroid_threat * is_right)
+            threat_left = max(threat_left, per_asteroid_threat * is_left)
+            threat_center = max(threat_center, per_asteroid_threat * is_center)
+
+        for j in range(n_bullets):
+            if bullet_hit[j]:
+                bullet_alive[b, j] = False
+
+        threats[b, 0] = threat_left
+        threats[b, 1] = threat_center
+        threats[b, 2] = threat_right
+        hit[b] = hit_b
+        kill[b] = kill_b
+
+
+if njit is not None:
+    _fused_tick_kernel = njit(cache=True)(_fused_tick_kernel)
+
+
+def fused_update_game_state_batched(
+    state: BatchedGameState,
+    heading_code: np.ndarray,
+    thrust_on: np.ndarray,
+    shoot: np.ndarray,
+    dt: float,
+    max_size: np.ndarray,
+    max_dist: float = MAX_DISTANCE,
+    theta_center_deg: float = 10.0,
+    w_dist: float = 0.5,
+    w_speed: float = 0.3,
+    w_size: float = 0.2,
+    turn_rate_rad_s: float = math.radians(180),
+    thrust_accel: float = 50.0,
+    bullet_speed: float = 200.0,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    update_game_state_batched followed by compute_directional_threat_batched
+    on the updated state, fused into a single compiled pass when numba is
+    installed and the batch is on the CPU (separate array passes otherwise).
+    Returns (hit, kill, threats): (B,) bools and the (B, 3) threats of the
+    state after the step, i.e. the encoder input of the next step.
+    """
+    if njit is None or array_module(state.ship_x) is not np:
+        # separate passes, also the path for batches living on the GPU
+        hit, kill = update_game_state_batched(state, heading_code, thrust_on, shoot, dt)
+        threats = compute_directional_threat_batched(state, max_size, max_dist, theta_center_deg,
+                                                     w_dist, w_speed, w_size)
+        return hit, kill, threats
+
+    max_size = np.broadcast_to(np.asarray(max_size, dtype=float), state.ship_x.shape)
+    batch = state.batch_size
+    threats = np.zeros((batch, 3))
+    hit = np.zeros(batch, dtype=bool)
+    kill = np.zeros(batch, dtype=bool)
+    _fused_tick_kernel(
+        state.ship_x, state.ship_y, state.ship_vx, state.ship_vy, state.ship_heading,
+        state.ast_x, state.ast_y, state.ast_vx, state.ast_vy, state.ast_size, state.ast_alive,
+        state.bullet_x, state.bullet_y, state.bullet_vx, state.bullet_vy,
+        state.bullet_expires_at, state.bullet_alive,
+        np.asarray(heading_code, dtype=np.int64), np.asarray(thrust_on, dtype=bool),
+        np.asarray(shoot, dtype=bool), float(state.t_s), dt, np.ascontiguousarray(max_size),
+        max_dist, math.cos(math.radians(theta_center_deg)), w_dist, w_speed, w_size,
+        turn_rate_rad_s, thrust_accel, bullet_speed,
+        threats, hit, kill,
+    )
+    state.t_s += dt
+    return hit, kill, threats
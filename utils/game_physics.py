@@ -1,8 +1,14 @@
 from typing import List, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import math
+import numpy as np
 from utils.decoding import Action
 
+try:
+    import cupy
+except ImportError:  # cupy is optional, batches stay on the CPU without it
+    cupy = None
+
 WORLD_WIDTH  = 800   
 WORLD_HEIGHT = 600
 
@@ -10,16 +16,32 @@ SHIP_RADIUS = 10.0
 BULLET_RADIUS = 3.0
 BULLET_MAX_AGE_S = 1.5  # seconds
 DT = 0.010  # 10 ms bin / game step
+PI = 3.141592653589793
+TWO_PI = 6.283185307179586
+MAX_BULLETS = int(math.ceil(BULLET_MAX_AGE_S / DT)) + 1  # at most one shot per step
+VECTOR_MIN_PAIRS = 384  # live bullet x asteroid count above which collisions are tested as arrays
+GRID_MIN_PAIRS = 10_000  # bullet x asteroid count above which collisions go through a grid
 
-@dataclass
+@dataclass(slots=True)
 class Ship:
     x: float
     y: float
     vx: float
     vy: float
     heading: float  # in radians
+    # cos / sin of heading, recomputed only when the heading changes
+    _cos_h: float = field(default=1.0, init=False, repr=False, compare=False)
+    _sin_h: float = field(default=0.0, init=False, repr=False, compare=False)
+    _trig_heading: float = field(default=math.nan, init=False, repr=False, compare=False)
 
-@dataclass
+    def heading_cos_sin(self) -> Tuple[float, float]:
+        if self.heading != self._trig_heading:
+            self._cos_h = math.cos(self.heading)
+            self._sin_h = math.sin(self.heading)
+            self._trig_heading = self.heading
+        return self._cos_h, self._sin_h
+
+@dataclass(slots=True)
 class Asteroid:
     x: float
     y: float
@@ -28,28 +50,40 @@ class Asteroid:
     size: float
     alive: bool = True
 
-@dataclass
+@dataclass(slots=True)
 class Bullet:
     x: float
     y: float
     vx: float
     vy: float
     alive: bool = True
-    age_s: float = 0.0  # how long the bullet has existed
+    expires_at: float = math.inf  # game time (t_s) at which the bullet disappears
 
-@dataclass
+    def age_s(self, t_s: float) -> float:
+        """ How long the bullet has existed at game time `t_s`."""
+        return BULLET_MAX_AGE_S - (self.expires_at - t_s)
+
+@dataclass(slots=True)
 class GameState:
     ship: Ship
     asteroids: List[Asteroid]
     bullets: List[Bullet]
     t_s: float = 0.0
+    # Size of the largest asteroid in play (threat size normalizer), kept
+    # up to date by spawn_asteroid and update_game_state
+    max_asteroid_size: float = field(default=0.0, init=False)
+
+    def __post_init__(self):
+        self.max_asteroid_size = max((a.size for a in self.asteroids), default=0.0)
 
 
 def wrap_angle(angle: float) -> float:
     """
     Map any angle to the range [-pi, pi].
     """
-    return (angle + math.pi) % (2 * math.pi) - math.pi
+    if -PI <= angle < PI:
+        return angle
+    return (angle + PI) % TWO_PI - PI
 
 def wrap_position(x: float, y: float) -> tuple[float, float]:
     x = x % WORLD_WIDTH
@@ -63,27 +97,36 @@ def circle_collision(x1, y1, r1, x2, y2, r2) -> bool:
     return dx * dx + dy * dy <= (r1 + r2) * (r1 + r2)
 
 
-def spawn_bullet(ship: Ship, bullet_speed: float = 200.0) -> Bullet:
-    """ Create a bullet at the ship's position, moving in the ship's heading direction."""
-    vx = bullet_speed * math.cos(ship.heading)
-    vy = bullet_speed * math.sin(ship.heading)
-    return Bullet(x=ship.x, y=ship.y, vx=vx, vy=vy, alive=True, age_s=0.0)
+def spawn_bullet(ship: Ship, bullet_speed: float = 200.0, *, t_s: float) -> Bullet:
+    """ Create a bullet at the ship's position, moving in the ship's heading direction.
+    It expires BULLET_MAX_AGE_S after `t_s`, the current game time."""
+    cos_h, sin_h = ship.heading_cos_sin()
+    vx = bullet_speed * cos_h
+    vy = bullet_speed * sin_h
+    return Bullet(x=ship.x, y=ship.y, vx=vx, vy=vy, alive=True, expires_at=t_s + BULLET_MAX_AGE_S)
+
+def spawn_asteroid(state: GameState, asteroid: Asteroid):
+    """ Add an asteroid to the game, keeping max_asteroid_size current."""
+    if not asteroid.alive:
+        return
+    state.asteroids.append(asteroid)
+    state.max_asteroid_size = max(state.max_asteroid_size, asteroid.size)
 
 def update_ship(ship: Ship, action: Action, dt: float,
                 turn_rate_rad_s: float = math.radians(180),  # 180°/s
                 thrust_accel: float = 50.0):
-    # Turn
-    if action.heading.value == "left":
-        ship.heading -= turn_rate_rad_s * dt
-    elif action.heading.value == "right":
-        ship.heading += turn_rate_rad_s * dt
+    # Turn: Heading value is the sign of the heading change
+    ship.heading += action.heading * (turn_rate_rad_s * dt)
 
-    ship.heading = wrap_angle(ship.heading)
+    # wrap_angle, inlined; a single turn step rarely leaves [-pi, pi)
+    if not -PI <= ship.heading < PI:
+        ship.heading = (ship.heading + PI) % TWO_PI - PI
 
     # Thrust
     if action.thrust_on:
-        ax = thrust_accel * math.cos(ship.heading)
-        ay = thrust_accel * math.sin(ship.heading)
+        cos_h, sin_h = ship.heading_cos_sin()
+        ax = thrust_accel * cos_h
+        ay = thrust_accel * sin_h
     else:
         ax = ay = 0.0
 
@@ -105,24 +148,111 @@ def update_asteroids(asteroids: List[Asteroid], dt: float):
         a.x, a.y = wrap_position(a.x, a.y)
     asteroids[:] = [a for a in asteroids if a.alive]
 
-def update_bullets(bullets: List[Bullet], dt: float):
+def update_bullets(bullets: List[Bullet], dt: float, t_s: float):
     """
-    Move bullets, wrap positions, age them, and mark as dead
-    once they exceed BULLET_MAX_AGE_S.
+    Move bullets, wrap positions, and mark as dead once they reach their
+    expiry time. t_s is the game time at the start of the step.
     """
+    # Game time at the end of the step; the slack absorbs the rounding of
+    # t_s accumulated over many steps, so a bullet always lives
+    # BULLET_MAX_AGE_S / dt steps
+    now_s = t_s + dt + 1e-6 * dt
+    any_dead = False
     for b in bullets:
         if not b.alive:
+            any_dead = True
             continue
         b.x += b.vx * dt
         b.y += b.vy * dt
         b.x, b.y = wrap_position(b.x, b.y)
 
-        # Age bullet and kill after max lifetime
-        b.age_s += dt
-        if b.age_s >= BULLET_MAX_AGE_S:
+        # Kill after max lifetime
+        if now_s >= b.expires_at:
             b.alive = False
-    bullets[:] = [b for b in bullets if b.alive]
+            any_dead = True
+    # Only rebuild when something died; keeps firing order for detect_hits_and_kills
+    if any_dead:
+        bullets[:] = [b for b in bullets if b.alive]
+
+
+def _bullet_asteroid_pairs(bx: np.ndarray, by: np.ndarray,
+                           ax: np.ndarray, ay: np.ndarray, size: np.ndarray) -> np.ndarray:
+    """
+    (bullets, asteroids) boolean overlap matrix. Large fields bucket the
+    asteroids into a uniform grid whose cells are as large as the largest
+    collision reach, and only test pairs in the same or adjacent cells.
+    Cells do not wrap around the world edges, like the collision test.
+    """
+    reach = BULLET_RADIUS + size
+    if len(bx) * len(ax) < GRID_MIN_PAIRS:
+        dx = bx[:, None] - ax
+        dy = by[:, None] - ay
+        return dx * dx + dy * dy <= reach * reach
+
+    # Cell key = column * n_rows + row, shifted so neighbours of edge cells
+    # stay distinct; asteroids sorted by key, each neighbour cell is a run
+    cell = float(reach.max())
+    n_rows = int(WORLD_HEIGHT // cell) + 3
+    def cell_keys(x, y):
+        return (x // cell).astype(np.int64) * n_rows + (y // cell).astype(np.int64) + (n_rows + 1)
+
+    ast_keys = cell_keys(ax, ay)
+    order = np.argsort(ast_keys, kind="stable")
+    sorted_keys = ast_keys[order]
+    neighbours = (np.arange(-1, 2)[:, None] * n_rows + np.arange(-1, 2)[None, :]).ravel()
+    query = cell_keys(bx, by)[:, None] + neighbours
+    lo = np.searchsorted(sorted_keys, query, "left").ravel()
+    counts = np.searchsorted(sorted_keys, query, "right").ravel() - lo
+
+    pairs = np.zeros((len(bx), len(ax)), dtype=bool)
+    total = int(counts.sum())
+    if total == 0:
+        return pairs
+    bullet_idx = np.repeat(np.repeat(np.arange(len(bx)), len(neighbours)), counts)
+    run_offset = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+    ast_idx = order[run_offset + np.arange(total)]
+
+    dx = bx[bullet_idx] - ax[ast_idx]
+    dy = by[bullet_idx] - ay[ast_idx]
+    candidate_reach = reach[ast_idx]
+    overlap = dx * dx + dy * dy <= candidate_reach * candidate_reach
+    pairs[bullet_idx[overlap], ast_idx[overlap]] = True
+    return pairs
+
 
+def _shoot_asteroids_vectorized(bullets: List[Bullet], asteroids: List[Asteroid]) -> bool:
+    """
+    Bullet–asteroid collisions between live `bullets` and live `asteroids`
+    with all (bullet, asteroid) overlaps computed at once. Same rule as the
+    loop in detect_hits_and_kills: each bullet, in order, destroys the
+    first asteroid still alive it overlaps. Returns whether anything died.
+    """
+    bx = np.array([b.x for b in bullets])
+    by = np.array([b.y for b in bullets])
+    ax, ay, size = np.array([(a.x, a.y, a.size) for a in asteroids]).T
+    pairs = _bullet_asteroid_pairs(bx, by, ax, ay, size)
+    if not pairs.any():
+        return False
+
+    if pairs.sum(axis=0).max() == 1 and pairs.sum(axis=1).max() == 1:
+        # One-to-one overlaps: every overlapping bullet destroys its asteroid
+        bullet_hit = pairs.any(axis=1)
+        ast_hit = pairs.any(axis=0)
+    else:
+        # Contested overlaps: each bullet destroys the first asteroid
+        # still alive, in order
+        bullet_hit = np.zeros(len(bullets), dtype=bool)
+        ast_hit = np.zeros(len(asteroids), dtype=bool)
+        for j in np.flatnonzero(pairs.any(axis=1)):
+            overlap = pairs[j] & ~ast_hit
+            if overlap.any():
+                ast_hit[overlap.argmax()] = True
+                bullet_hit[j] = True
+    for j in np.flatnonzero(bullet_hit):
+        bullets[j].alive = False
+    for i in np.flatnonzero(ast_hit):
+        asteroids[i].alive = False
+    return True
 
 def detect_hits_and_kills(state: GameState) -> Tuple[bool, bool]:
     hit = False
@@ -136,33 +266,253 @@ def detect_hits_and_kills(state: GameState) -> Tuple[bool, bool]:
             hit = True
             break
 
-    # Bullet–asteroid collisions
-    for b in state.bullets:
-        if not b.alive:
-            continue
-        for a in state.asteroids:
-            if not a.alive:
+    # Bullet–asteroid collisions: loop over the pairs, or test them as
+    # arrays once there are enough of them to pay for the packing
+    if len(state.bullets) * len(state.asteroids) >= VECTOR_MIN_PAIRS:
+        bullets = [b for b in state.bullets if b.alive]
+        asteroids = [a for a in state.asteroids if a.alive]
+        kill = bool(bullets) and bool(asteroids) and _shoot_asteroids_vectorized(bullets, asteroids)
+    else:
+        for b in state.bullets:
+            if not b.alive:
                 continue
-            if circle_collision(b.x, b.y, BULLET_RADIUS, a.x, a.y, a.size):
-                kill = True
-                a.alive = False
-                b.alive = False
-                break
-            
-    state.asteroids = [a for a in state.asteroids if a.alive]
-    state.bullets   = [b for b in state.bullets   if b.alive]
+            for a in state.asteroids:
+                if not a.alive:
+                    continue
+                if circle_collision(b.x, b.y, BULLET_RADIUS, a.x, a.y, a.size):
+                    kill = True
+                    a.alive = False
+                    b.alive = False
+                    break
+
+    if kill:
+        state.asteroids = [a for a in state.asteroids if a.alive]
+        state.bullets = [b for b in state.bullets if b.alive]
     return hit, kill
 
 def update_game_state(state: GameState, action: Action, dt: float):
     """ Update the game state by one time step given the action"""
     if action.shoot:
-        state.bullets.append(spawn_bullet(state.ship))
+        state.bullets.append(spawn_bullet(state.ship, t_s=state.t_s))
     update_ship(state.ship, action, dt)
     update_asteroids(state.asteroids, dt)
-    update_bullets(state.bullets, dt)
+    update_bullets(state.bullets, dt, state.t_s)
     hit, kill = detect_hits_and_kills(state)
+    if kill:
+        # Asteroids only disappear when shot: rescan only then
+        state.max_asteroid_size = max((a.size for a in state.asteroids), default=0.0)
     state.t_s += dt
     return hit, kill
 
 
+### === BATCHED GAMES (structure of arrays) =====
+
+def array_module(arr):
+    """ numpy, or cupy for arrays living on the GPU."""
+    return cupy.get_array_module(arr) if cupy is not None else np
+
+def to_numpy(arr) -> np.ndarray:
+    """ Host copy of a numpy or cupy array (numpy arrays are returned as is)."""
+    return cupy.asnumpy(arr) if cupy is not None else np.asarray(arr)
+
+@dataclass
+class BatchedGameState:
+    """
+    `B` independent games stepped in lockstep, stored as arrays.
+    Ship fields have shape (B,), asteroid fields (B, A) and bullet fields
+    (B, MAX_BULLETS). Dead asteroids / bullets stay in place and are
+    masked out by `ast_alive` / `bullet_alive`. Like Bullet.expires_at,
+    `bullet_expires_at` is the game time (t_s) at which a bullet disappears.
+    """
+    ship_x: np.ndarray
+    ship_y: np.ndarray
+    ship_vx: np.ndarray
+    ship_vy: np.ndarray
+    ship_heading: np.ndarray
+
+    ast_x: np.ndarray
+    ast_y: np.ndarray
+    ast_vx: np.ndarray
+    ast_vy: np.ndarray
+    ast_size: np.ndarray
+    ast_alive: np.ndarray
+
+    bullet_x: np.ndarray
+    bullet_y: np.ndarray
+    bullet_vx: np.ndarray
+    bullet_vy: np.ndarray
+    bullet_expires_at: np.ndarray
+    bullet_alive: np.ndarray
+
+    t_s: float = 0.0
 
+    @classmethod
+    def from_states(cls, states: List[GameState], max_bullets: int = MAX_BULLETS) -> "BatchedGameState":
+        """
+        Pack a list of GameState into one batch. Asteroid arrays are padded
+        (as dead asteroids) to the largest asteroid count in `states`.
+        """
+        batch = len(states)
+        n_ast = max((len(st.asteroids) for st in states), default=0)
+
+        ship = np.array([(st.ship.x, st.ship.y, st.ship.vx, st.ship.vy, st.ship.heading)
+                         for st in states], dtype=float).reshape(batch, 5)
+        ast = np.zeros((5, batch, n_ast))
+        ast_alive = np.zeros((batch, n_ast), dtype=bool)
+        for b, st in enumerate(states):
+            for i, a in enumerate(st.asteroids):
+                ast[:, b, i] = (a.x, a.y, a.vx, a.vy, a.size)
+                ast_alive[b, i] = a.alive
+
+        # Bullet expiry times are moved onto the batch clock, states[0].t_s
+        t_s = states[0].t_s if states else 0.0
+        bullets = np.zeros((5, batch, max_bullets))
+        bullet_alive = np.zeros((batch, max_bullets), dtype=bool)
+        for b, st in enumerate(states):
+            for i, bl in enumerate(st.bullets[:max_bullets]):
+                bullets[:, b, i] = (bl.x, bl.y, bl.vx, bl.vy, bl.expires_at + (t_s - st.t_s))
+                bullet_alive[b, i] = bl.alive
+
+        return cls(
+            *ship.T.copy(),
+            *ast, ast_alive,
+            *bullets, bullet_alive,
+            t_s=t_s,
+        )
+
+    @property
+    def batch_size(self) -> int:
+        return self.ship_x.shape[0]
+
+    def reset(self, mask: np.ndarray, initial: "BatchedGameState"):
+        """Copy ship, asteroids and bullets from `initial` for the games in `mask`.
+        Bullet expiry times are moved from initial's clock onto this one."""
+        mask = array_module(self.ship_x).asarray(mask)
+        for name in self.__dataclass_fields__:
+            if name == "t_s":
+                continue
+            getattr(self, name)[mask] = getattr(initial, name)[mask]
+        self.bullet_expires_at[mask] += self.t_s - initial.t_s
+
+    def copy(self) -> "BatchedGameState":
+        return BatchedGameState(
+            *(getattr(self, name).copy() for name in self.__dataclass_fields__ if name != "t_s"),
+            t_s=self.t_s,
+        )
+
+    def to_backend(self, backend: str = "numpy") -> "BatchedGameState":
+        """ Copy of the batch with its arrays on the CPU ("numpy") or the GPU ("cupy")."""
+        if backend == "cupy":
+            if cupy is None:
+                raise ImportError("backend='cupy' requires cupy to be installed")
+            convert = cupy.asarray
+        elif backend == "numpy":
+            convert = to_numpy
+        else:
+            raise ValueError(f"Unknown backend {backend!r}, expected 'numpy' or 'cupy'")
+        return BatchedGameState(
+            *(convert(getattr(self, name)) for name in self.__dataclass_fields__ if name != "t_s"),
+            t_s=self.t_s,
+        )
+
+    def max_asteroid_size(self) -> np.ndarray:
+        """ (B,) size of the largest live asteroid of each game (0 if none)."""
+        if self.ast_size.shape[1] == 0:
+            return array_module(self.ast_size).zeros(self.batch_size)
+        return (self.ast_size * self.ast_alive).max(axis=1)
+
+
+def spawn_bullets_batched(state: BatchedGameState, shoot: np.ndarray, bullet_speed: float = 200.0):
+    """
+    Spawn a bullet in the first free slot of every game where `shoot` is True.
+    Games with no free slot drop the shot.
+    """
+    xp = array_module(state.ship_x)
+    free = ~state.bullet_alive
+    envs = xp.nonzero(shoot & free.any(axis=1))[0]
+    slots = free[envs].argmax(axis=1)
+
+    heading = state.ship_heading[envs]
+    state.bullet_x[envs, slots] = state.ship_x[envs]
+    state.bullet_y[envs, slots] = state.ship_y[envs]
+    state.bullet_vx[envs, slots] = bullet_speed * xp.cos(heading)
+    state.bullet_vy[envs, slots] = bullet_speed * xp.sin(heading)
+    state.bullet_expires_at[envs, slots] = state.t_s + BULLET_MAX_AGE_S
+    state.bullet_alive[envs, slots] = True
+
+
+def update_ship_batched(state: BatchedGameState, heading_code: np.ndarray, thrust_on: np.ndarray,
+                        dt: float,
+                        turn_rate_rad_s: float = math.radians(180),
+                        thrust_accel: float = 50.0):
+    """
+    Same as update_ship on (B,) arrays. heading_code holds Heading values,
+    i.e. the sign of the heading change.
+    """
+    xp = array_module(state.ship_x)
+    heading = state.ship_heading + heading_code * (turn_rate_rad_s * dt)
+    in_range = (heading >= -PI) & (heading < PI)
+    state.ship_heading[:] = xp.where(in_range, heading, xp.remainder(heading + PI, TWO_PI) - PI)
+
+    accel = xp.where(thrust_on, thrust_accel * dt, 0.0)
+    state.ship_vx += accel * xp.cos(state.ship_heading)
+    state.ship_vy += accel * xp.sin(state.ship_heading)
+
+    state.ship_x[:] = xp.remainder(state.ship_x + state.ship_vx * dt, WORLD_WIDTH)
+    state.ship_y[:] = xp.remainder(state.ship_y + state.ship_vy * dt, WORLD_HEIGHT)
+
+
+def update_asteroids_batched(state: BatchedGameState, dt: float):
+    xp = array_module(state.ast_x)
+    state.ast_x[:] = xp.remainder(state.ast_x + state.ast_vx * dt, WORLD_WIDTH)
+    state.ast_y[:] = xp.remainder(state.ast_y + state.ast_vy * dt, WORLD_HEIGHT)
+
+
+def update_bullets_batched(state: BatchedGameState, dt: float):
+    xp = array_module(state.bullet_x)
+    state.bullet_x[:] = xp.remainder(state.bullet_x + state.bullet_vx * dt, WORLD_WIDTH)
+    state.bullet_y[:] = xp.remainder(state.bullet_y + state.bullet_vy * dt, WORLD_HEIGHT)
+    # Same expiry rule as update_bullets, state.t_s being the time at the
+    # start of the step
+    now_s = state.t_s + dt + 1e-6 * dt
+    state.bullet_alive &= now_s < state.bullet_expires_at
+
+
+def detect_hits_and_kills_batched(state: BatchedGameState) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns (hit, kill) boolean arrays of shape (B,).
+    Unlike the sequential version, a bullet overlapping several asteroids
+    in the same step destroys all of them.
+    """
+    # Ship–asteroid collisions, (B, A)
+    dx = state.ast_x - state.ship_x[:, None]
+    dy = state.ast_y - state.ship_y[:, None]
+    reach = SHIP_RADIUS + state.ast_size
+    hit = (state.ast_alive & (dx * dx + dy * dy <= reach * reach)).any(axis=1)
+
+    # Bullet–asteroid collisions, (B, MAX_BULLETS, A)
+    dx = state.bullet_x[:, :, None] - state.ast_x[:, None, :]
+    dy = state.bullet_y[:, :, None] - state.ast_y[:, None, :]
+    reach = BULLET_RADIUS + state.ast_size[:, None, :]
+    pairs = (dx * dx + dy * dy <= reach * reach)
+    pairs &= state.bullet_alive[:, :, None] & state.ast_alive[:, None, :]
+
+    bullet_hit = pairs.any(axis=2)
+    ast_hit = pairs.any(axis=1)
+    state.bullet_alive &= ~bullet_hit
+    state.ast_alive &= ~ast_hit
+    kill = ast_hit.any(axis=1)
+    return hit, kill
+
+
+def update_game_state_batched(state: BatchedGameState, heading_code: np.ndarray,
+                              thrust_on: np.ndarray, shoot: np.ndarray, dt: float):
+    """ Update all games by one time step given per-game action arrays
+    (on the same device as the state)"""
+    spawn_bullets_batched(state, shoot)
+    update_ship_batched(state, heading_code, thrust_on, dt)
+    update_asteroids_batched(state, dt)
+    update_bullets_batched(state, dt)
+    hit, kill = detect_hits_and_kills_batched(state)
+    state.t_s += dt
+    return hit, kill
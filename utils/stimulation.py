@@ -1,15 +1,29 @@
 import numpy as np
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import Dict
 
 from utils.encoding import StimFreqs
 
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional, the NumPy path is used without it
+    njit = None
+    prange = range
 
-@dataclass
+WAVEFORM_DTYPE = np.float32  # stimulation samples (mV-scale amplitudes)
+
+# Pulse samples to write (all directions) above which the three trains
+# are filled on parallel threads; below it thread dispatch costs more
+PARALLEL_MIN_PULSE_SAMPLES = 100_000
+
+
+@dataclass(frozen=True, slots=True)
 class StimConfig:
     """
     Parameters for generating biphasic stimulation waveforms.
     All times in seconds, amplitude in Volts (75 mV = 0.075).
+    Frozen (hashable); derive variants with dataclasses.replace.
     """
     sampling_rate: int = 20_000         # samples per second
     pulse_amplitude: float = 0.075      # 75 mV biphasic
@@ -22,20 +36,74 @@ class StimConfig:
 
 
 # Single biphasic pulse
+@lru_cache(maxsize=16)
+def _biphasic_pulse(sampling_rate: int, pulse_amplitude: float,
+                    phase_width_s: float, inter_phase_gap_s: float,
+                    dtype=WAVEFORM_DTYPE) -> np.ndarray:
+    n_phase = int(round(phase_width_s * sampling_rate))
+    n_gap   = int(round(inter_phase_gap_s * sampling_rate))
+
+    phase1 = np.full(n_phase,  pulse_amplitude, dtype=dtype)
+    gap    = np.zeros(n_gap, dtype=dtype) if n_gap > 0 else np.array([], dtype=dtype)
+    phase2 = np.full(n_phase, -pulse_amplitude, dtype=dtype)
+
+    pulse = np.concatenate([phase1, gap, phase2])
+    pulse.setflags(write=False)
+    return pulse
+
+
 def make_biphasic_pulse(cfg: StimConfig) -> np.ndarray:
     """
     Create a single biphasic pulse (+amp then -amp) at the given sampling rate.
-    Returns: 1D numpy array of shape (n_samples_in_pulse,).
+    Returns: 1D numpy array of shape (n_samples_in_pulse,). The array is
+    cached per config and read-only.
     """
-    n_phase = int(round(cfg.phase_width_s * cfg.sampling_rate))
-    n_gap   = int(round(cfg.inter_phase_gap_s * cfg.sampling_rate))
+    return _biphasic_pulse(cfg.sampling_rate, cfg.pulse_amplitude,
+                           cfg.phase_width_s, cfg.inter_phase_gap_s)
 
-    phase1 = np.full(n_phase,  cfg.pulse_amplitude, dtype=float)
-    gap    = np.zeros(n_gap, dtype=float) if n_gap > 0 else np.array([], dtype=float)
-    phase2 = np.full(n_phase, -cfg.pulse_amplitude, dtype=float)
 
-    pulse = np.concatenate([phase1, gap, phase2])
-    return pulse
+def _biphasic_pulse_f64(cfg: StimConfig) -> np.ndarray:
+    """ make_biphasic_pulse in float64, to sum overlapping pulses."""
+    return _biphasic_pulse(cfg.sampling_rate, cfg.pulse_amplitude,
+                           cfg.phase_width_s, cfg.inter_phase_gap_s, np.float64)
+
+
+def _fill_train(signal: np.ndarray, pulse: np.ndarray, period_samples: int):
+    """ Add `pulse` into `signal` every `period_samples`, while it fits."""
+    pulse_len = pulse.shape[0]
+    total_samples = signal.shape[0]
+    t = 0
+    while t + pulse_len <= total_samples:
+        for i in range(pulse_len):
+            signal[t + i] += pulse[i]
+        t += period_samples
+
+
+def _fill_rows(signals: np.ndarray, pulse: np.ndarray, periods: np.ndarray):
+    """ _fill_train on every row of `signals`; rows with period 0 stay silent."""
+    for i in prange(signals.shape[0]):
+        if periods[i] > 0:
+            _fill_train(signals[i], pulse, periods[i])
+
+
+if njit is not None:
+    _fill_train = njit(cache=True)(_fill_train)
+    _fill_rows_parallel = njit(cache=True, parallel=True)(_fill_rows)  # compiled on first long train
+    _fill_rows = njit(cache=True)(_fill_rows)
+    # Pay the JIT cost once at import instead of on the first stimulation
+    _fill_rows(np.zeros((1, 2), dtype=WAVEFORM_DTYPE), make_biphasic_pulse(StimConfig()), np.ones(1, dtype=np.int64))
+
+
+@lru_cache(maxsize=32)
+def _pulse_index(pulse_len: int, period_samples: int, total_samples: int) -> np.ndarray:
+    """
+    (n_pulses, pulse_len) sample indices of every pulse that fits in the
+    train, i.e. the same placements as _fill_train.
+    """
+    starts = np.arange(0, total_samples - pulse_len + 1, period_samples)
+    index = starts[:, None] + np.arange(pulse_len)[None, :]
+    index.setflags(write=False)
+    return index
 
 
 # Constant-frequency pulse train for each direction
@@ -47,27 +115,54 @@ def generate_pulse_train_constant_freq(freq_hz: float,
     No jitter, perfectly periodic pulses.
     """
     total_samples = int(round(duration_s * cfg.sampling_rate))
-    signal = np.zeros(total_samples, dtype=float)
+    signal = np.zeros(total_samples, dtype=WAVEFORM_DTYPE)
+    _add_pulse_train(signal, freq_hz, cfg)
+    return signal
 
+
+def _period_samples(freq_hz: float, cfg: StimConfig) -> int:
+    """ Samples between pulse onsets, 0 for no stim."""
     if freq_hz <= 0.0:
-        return signal  # no stim
+        return 0
+    period_s = 1.0 / freq_hz
+    return int(round(period_s * cfg.sampling_rate))
 
-    pulse = make_biphasic_pulse(cfg)
-    pulse_len = len(pulse)
 
-    period_s = 1.0 / freq_hz
-    period_samples = int(round(period_s * cfg.sampling_rate))
+def _add_pulse_train(signal: np.ndarray, freq_hz: float, cfg: StimConfig):
+    """ Add a constant-frequency pulse train into the zeroed `signal`."""
+    period_samples = _period_samples(freq_hz, cfg)
+    if period_samples <= 0:
+        return  # no stim
 
-    t = 0
-    while t + pulse_len <= total_samples:
-        signal[t:t + pulse_len] += pulse
-        t += period_samples
+    pulse = _biphasic_pulse_f64(cfg) if signal.dtype == np.float64 else make_biphasic_pulse(cfg)
+    pulse_len = len(pulse)
 
-    return signal
+    if period_samples < pulse_len and signal.dtype != np.float64:
+        # Overlapping pulses add up: sum them in float64 and round once,
+        # so every sample is the cast of the float64 train
+        scratch = np.zeros(signal.shape[0])
+        _add_pulse_train(scratch, freq_hz, cfg)
+        signal[:] = scratch
+        return
+
+    if njit is not None:
+        _fill_train(signal, pulse, period_samples)
+        return
+
+    index = _pulse_index(pulse_len, period_samples, signal.shape[0])
+    if period_samples >= pulse_len:
+        signal[index] = pulse
+    else:
+        # Overlapping pulses (above sampling_rate / pulse_len Hz) add up;
+        # a column never repeats an index, so += per pulse sample is safe.
+        # Last column first: each sample then sums its pulses in onset
+        # order, like _fill_train
+        for i in reversed(range(pulse_len)):
+            signal[index[:, i]] += pulse[i]
 
 
 # Pulse trains for left / center / right using StimFrequencies
-@dataclass
+@dataclass(slots=True)
 class DirectionalWaveforms:
     left: np.ndarray
     center: np.ndarray
@@ -78,14 +173,33 @@ def generate_directional_trains(freqs: StimFreqs,
                                            cfg: StimConfig) -> DirectionalWaveforms:
     """
     Generate pulse trains for left, center, and right directions using
-    the StimFrequencies dataclass.
+    the StimFrequencies dataclass. The three waveforms are rows of one
+    (3, n_samples) array.
     """
-    left_wave = generate_pulse_train_constant_freq(freqs.left_hz,   duration_s, cfg)
-    center_wave = generate_pulse_train_constant_freq(freqs.center_hz, duration_s, cfg)
-    right_wave = generate_pulse_train_constant_freq(freqs.right_hz, duration_s, cfg)
+    total_samples = int(round(duration_s * cfg.sampling_rate))
+    signals = np.zeros((3, total_samples), dtype=WAVEFORM_DTYPE)
+    freqs_hz = (freqs.left_hz, freqs.center_hz, freqs.right_hz)
+
+    if njit is None:
+        for row, freq_hz in zip(signals, freqs_hz):
+            _add_pulse_train(row, freq_hz, cfg)
+    else:
+        # The rows are disjoint: one compiled call fills all three, on
+        # parallel threads when the trains are long enough to pay off
+        pulse = make_biphasic_pulse(cfg)
+        periods = np.array([_period_samples(f, cfg) for f in freqs_hz], dtype=np.int64)
+        pulse_samples = sum(total_samples // p for p in periods.tolist() if p > 0) * len(pulse)
+        fill = _fill_rows_parallel if pulse_samples >= PARALLEL_MIN_PULSE_SAMPLES else _fill_rows
+        if ((periods > 0) & (periods < len(pulse))).any():
+            # Overlapping pulses: sum in float64, round once (see _add_pulse_train)
+            scratch = np.zeros(signals.shape)
+            fill(scratch, _biphasic_pulse_f64(cfg), periods)
+            signals[:] = scratch
+        else:
+            fill(signals, pulse, periods)
 
     return DirectionalWaveforms(
-        left=left_wave,
-        center=center_wave,
-        right=right_wave,
+        left=signals[0],
+        center=signals[1],
+        right=signals[2],
     )
\ No newline at end of file
@@ -1,11 +1,179 @@
+import math
+import os
+from functools import lru_cache
+import matplotlib
+# VIZ_HEADLESS=1 (training / batch runs): render off-screen with Agg, no GUI
+# windows or event loop; pass save_path to keep the frames
+HEADLESS = os.environ.get("VIZ_HEADLESS", "0") == "1"
+if HEADLESS:
+    matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import numpy as np
 from typing import Optional, Tuple, List
-from matplotlib.patches import Wedge, Patch
+from matplotlib.patches import Patch, Polygon
 from matplotlib.lines import Line2D 
+from matplotlib.collections import EllipseCollection
 
 from utils.stimulation import StimConfig
 from utils.encoding import Ship, Asteroid, Threat
+from utils.game_physics import WORLD_WIDTH, WORLD_HEIGHT
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional, the NumPy path is used without it
+    njit = None
+
+# Ship triangle (nose, rear-left, rear-right) for heading 0, unit scale
+_TRI_TEMPLATE = ((1.0, 0.0), (-0.5, 0.5), (-0.5, -0.5))
+
+
+def ship_triangle(x: float, y: float, angle: float, scale: float = 35) -> np.ndarray:
+    """ (3, 2) vertices of the ship triangle at (x, y), rotated to `angle`."""
+    # Three points: scalar math beats the array ops and matmul it replaces
+    c = math.cos(angle) * scale
+    s = math.sin(angle) * scale
+    return np.array([(x + tx * c - ty * s, y + tx * s + ty * c) for tx, ty in _TRI_TEMPLATE])
+
+
+CONE_ARC_POINTS = 8  # vertices on the centre-sector arc (0.12 units off the true arc at 400 units, 20°)
+
+@lru_cache(maxsize=8)
+def _cone_arc(theta_center_deg: float, n_arc: int = CONE_ARC_POINTS) -> Tuple[np.ndarray, np.ndarray]:
+    """ cos / sin of n_arc angles across the centre sector, for heading 0."""
+    theta_c = math.radians(theta_center_deg)
+    angles = np.linspace(-theta_c, theta_c, n_arc)
+    cos_a, sin_a = np.cos(angles), np.sin(angles)
+    cos_a.setflags(write=False)
+    sin_a.setflags(write=False)
+    return cos_a, sin_a
+
+
+def _center_sector(x: float, y: float, heading: float, max_dist: float,
+                   theta_center_deg: float) -> np.ndarray:
+    """
+    (n_arc + 1, 2) outline of the centre sector: the ship position then
+    the arc at max_dist, rotated from the cached heading-0 arc with
+    cos(a + h) = cos a cos h - sin a sin h (two trig calls per frame).
+    """
+    cos_a, sin_a = _cone_arc(theta_center_deg)
+    ch = math.cos(heading) * max_dist
+    sh = math.sin(heading) * max_dist
+    verts = np.empty((len(cos_a) + 1, 2))
+    verts[0] = x, y
+    verts[1:, 0] = x + (cos_a * ch - sin_a * sh)
+    verts[1:, 1] = y + (sin_a * ch + cos_a * sh)
+    return verts
+
+
+def _frame_geometry(x, y, heading, scale, max_dist, cos_a, sin_a):
+    """
+    ship_triangle and _center_sector of one frame in a single pass, from
+    one cos / sin of the heading: returns ((3, 2) triangle, (n_arc + 1, 2) sector).
+    """
+    c = math.cos(heading)
+    s = math.sin(heading)
+    tri = np.empty((3, 2))
+    for i in range(3):
+        tx = _TRI_TEMPLATE[i][0] * scale
+        ty = _TRI_TEMPLATE[i][1] * scale
+        tri[i, 0] = x + tx * c - ty * s
+        tri[i, 1] = y + tx * s + ty * c
+    n_arc = cos_a.shape[0]
+    sector = np.empty((n_arc + 1, 2))
+    sector[0, 0] = x
+    sector[0, 1] = y
+    for i in range(n_arc):
+        sector[i + 1, 0] = x + max_dist * (cos_a[i] * c - sin_a[i] * s)
+        sector[i + 1, 1] = y + max_dist * (sin_a[i] * c + cos_a[i] * s)
+    return tri, sector
+
+
+if njit is not None:
+    _frame_geometry = njit(cache=True)(_frame_geometry)
+    # Pay the JIT cost once at import instead of on the first frame
+    _frame_geometry(0.0, 0.0, 0.0, 1.0, 1.0, *_cone_arc(10.0))
+
+
+def _ship_geometry(ship: Ship, max_dist: float, theta_center_deg: float,
+                   scale: float = 35) -> Tuple[np.ndarray, np.ndarray]:
+    """ (ship triangle, centre-sector outline) vertices for the frame."""
+    if njit is None:
+        return (ship_triangle(ship.x, ship.y, ship.heading, scale),
+                _center_sector(ship.x, ship.y, ship.heading, max_dist, theta_center_deg))
+    return _frame_geometry(float(ship.x), float(ship.y), float(ship.heading), float(scale),
+                           float(max_dist), *_cone_arc(theta_center_deg))
+
+
+def _asteroid_columns(asteroids: List["Asteroid"]) -> Tuple[np.ndarray, ...]:
+    """ (xs, ys, sizes, vxs, vys) arrays of the asteroids."""
+    xs = np.array([ast.x for ast in asteroids], dtype=float)
+    ys = np.array([ast.y for ast in asteroids], dtype=float)
+    sizes = np.array([ast.size for ast in asteroids], dtype=float)
+    vxs = np.array([ast.vx for ast in asteroids], dtype=float)
+    vys = np.array([ast.vy for ast in asteroids], dtype=float)
+    return xs, ys, sizes, vxs, vys
+
+
+def _asteroid_bodies(ax, xs, ys, sizes, **kwargs) -> EllipseCollection:
+    """
+    Asteroid discs as one collection: a single shared circle path scaled
+    per asteroid, with radii in data units (units="xy"; CircleCollection
+    sizes are points²).
+    """
+    diameters = 2 * sizes
+    return EllipseCollection(diameters, diameters, 0.0, units="xy", offsets=np.column_stack((xs, ys)),
+                             offset_transform=ax.transData, facecolor="C0", alpha=0.6, **kwargs)
+
+
+ARROW_SCALE = 2.0  # velocity arrow length per unit speed, tune for display
+RASTERIZE_MIN_ASTEROIDS = 1000  # above this many, asteroid bodies are rasterized in vector output
+
+def _velocity_arrows(ax, xs, ys, vxs, vys, **kwargs):
+    """
+    All velocity arrows as one Quiver. Head sizes are in shaft widths
+    (0.003 of the axes width, 2.4 units on an 800-unit view), giving the
+    10 x 15 unit triangular heads the per-asteroid FancyArrows had.
+    """
+    return ax.quiver(xs, ys, vxs * ARROW_SCALE, vys * ARROW_SCALE, angles="xy", scale_units="xy", scale=1,
+                     width=0.003, headwidth=4.2, headlength=6.25, headaxislength=6.25,
+                     color="red", alpha=0.7, **kwargs)
+
+
+def _show_or_save(fig, save_path: Optional[str]):
+    """ Save to save_path if given, else show (nothing to show when headless)."""
+    if save_path is not None:
+        fig.savefig(save_path)
+    elif not HEADLESS:
+        plt.show()
+
+
+# Legend handles, shared by every game figure
+_SHIP_LEGEND = Patch(facecolor='black', edgecolor='black', label='Ship')
+_HEAD_LEGEND = Line2D([0], [0], linestyle='-', color='red', label='Heading direction')
+
+# Figure reused by visualize_game across calls
+_FIG = None
+_AX = None
+
+def _new_game_axes():
+    fig, ax = plt.subplots(figsize=(7, 7))
+    # A figure legend placed on the axes: built once, survives ax.clear()
+    fig.legend(handles=[_SHIP_LEGEND, _HEAD_LEGEND], loc='lower left',
+               bbox_to_anchor=(0, 0, 1, 1), bbox_transform=ax.transAxes)
+    return fig, ax
+
+
+def _game_axes(reuse: bool):
+    """ The cleared shared game figure / axes, (re)created if closed."""
+    global _FIG, _AX
+    if not reuse:
+        return _new_game_axes()
+    if _FIG is None or not plt.fignum_exists(_FIG.number):
+        _FIG, _AX = _new_game_axes()
+    else:
+        _AX.clear()
+    return _FIG, _AX
+
 
 def visualize_game(
     ship: "Ship",
@@ -13,50 +181,48 @@ def visualize_game(
     d_threat: Optional[Threat] = None,
     max_dist: float = 400.0,
     theta_center_deg: float = 10.0,
+    reuse: bool = True,
+    save_path: Optional[str] = None,
+    fast: bool = False,
 ):
     """
     Visualize the ship, asteroids, and optional directional threats.
 
     ship      : Ship instance
-    asteroids : list of Asteroid instances
+    asteroids : list of Asteroid instances, e.g. GameState.asteroids
     d_threat  : optional (d_left, d_center, d_right)
+    reuse     : draw into the figure of the previous call (cleared) instead
+                of creating a new one; a closed figure is replaced
+    save_path : save the figure there instead of showing it
+    fast      : throwaway frame (e.g. from a training loop): no grid, legend,
+                title, axis labels or ticks
     """
 
     x_s, y_s = ship.x, ship.y
-    heading = ship.heading
 
-    fig, ax = plt.subplots(figsize=(7, 7))
+    fig, ax = _game_axes(reuse)
+
+    tri, sector = _ship_geometry(ship, max_dist, theta_center_deg)
 
     # --- Ship triangle (larger + black) ---
-    def ship_triangle(x, y, angle, scale=35):
-        pts = np.array([[1, 0], [-0.5, 0.5], [-0.5, -0.5]]) * scale
-        rot = np.array([[np.cos(angle), -np.sin(angle)],
-                        [np.sin(angle),  np.cos(angle)]])
-        pts = pts @ rot.T
-        pts[:, 0] += x
-        pts[:, 1] += y
-        return pts
-
-    tri = ship_triangle(x_s, y_s, heading)
     ax.fill(tri[:, 0], tri[:, 1], color="black", alpha=0.9, label="Ship")
 
-    # Draw center sector as a shaded wedge 
-    theta_c = np.radians(theta_center_deg)
-    start_angle_deg = np.degrees(heading - theta_c)
-    end_angle_deg   = np.degrees(heading + theta_c)
+    # Draw center sector as a shaded polygon
+    ax.add_patch(Polygon(sector, closed=True, facecolor="lightgray", alpha=0.3, edgecolor=None))
 
-    wedge = Wedge(center=(x_s, y_s),r=max_dist,theta1=start_angle_deg,theta2=end_angle_deg,facecolor="lightgray",alpha=0.3,edgecolor=None)
-    ax.add_patch(wedge)
+    # Asteroids + velocity arrows, one artist each for the whole field,
+    # skipping those that cannot reach the view (body or arrow)
+    xs, ys, sizes, vxs, vys = _asteroid_columns(asteroids)
+    reach = max_dist + np.maximum(sizes, ARROW_SCALE * np.hypot(vxs, vys))
+    visible = (np.abs(xs - x_s) <= reach) & (np.abs(ys - y_s) <= reach)
+    xs, ys, sizes, vxs, vys = xs[visible], ys[visible], sizes[visible], vxs[visible], vys[visible]
 
-    # Asteroids + dashed line toward ship 
-    for ast in asteroids:
-        # asteroid body
-        ax.add_patch(
-            plt.Circle((ast.x, ast.y), ast.size, alpha=0.6)
-        )
-        # line from asteroid to ship
-        scale = 2.0  # tune for display
-        ax.arrow(ast.x, ast.y,ast.vx * scale, ast.vy * scale,head_width=10, head_length=15,length_includes_head=True,color="red",alpha=0.7,)
+    # asteroid bodies; a large field goes into vector output (PDF / SVG)
+    # as one raster image
+    ax.add_collection(_asteroid_bodies(ax, xs, ys, sizes, rasterized=len(xs) > RASTERIZE_MIN_ASTEROIDS))
+
+    # velocity arrows
+    _velocity_arrows(ax, xs, ys, vxs, vys)
 
     # Threat text 
     if d_threat is not None:
@@ -67,7 +233,6 @@ def visualize_game(
             f"Center = {d_center:.2f}\n"
             f"Right  = {d_right:.2f}"
         )
-        ship_legend = Patch(facecolor='black', edgecolor='black', label='Ship')
         ax.text(
             0.02, 0.98, text,
             transform=ax.transAxes,
@@ -75,52 +240,217 @@ def visualize_game(
             va='top',
             bbox=dict(facecolor='white', alpha=0.7)
         )
-        heading_legend = Line2D([0], [0], linestyle='-', color='red', label='Heading direction')
 
     # --- Formatting ---
     ax.set_aspect('equal')
-    ax.set_title("Asteroid Field Visualization")
-    ax.set_xlabel("X")
-    ax.set_ylabel("Y")
-    ax.grid(True)
-    ax.legend(handles = [ship_legend, heading_legend], loc='lower left')
-        
+    if fast:
+        ax.set_xticks([])
+        ax.set_yticks([])
+    else:
+        ax.set_title("Asteroid Field Visualization")
+        ax.set_xlabel("X")
+        ax.set_ylabel("Y")
+        ax.grid(True)
+    for legend in fig.legends:
+        legend.set_visible(not fast)
+
     ax.set_xlim(x_s - max_dist, x_s + max_dist)
     ax.set_ylim(y_s - max_dist, y_s + max_dist)
 
-    plt.show()
+    _show_or_save(fig, save_path)
 
 
-def plot_directional_stim(waves, cfg: StimConfig, max_duration_s=None):
+class GameViz:
     """
-    waves: DirectionalWaveforms(left, center, right)
-    cfg: StimConfig (for sampling rate)
-    max_duration_s: optional, plot only first N seconds
+    Live view of a running game over the whole world, redrawn by blitting.
+    Axes, grid and legend are drawn once into a cached background; each
+    update() restores it and redraws only the ship, centre sector,
+    asteroids and threat text, which are updated in place.
+
+        viz = GameViz()
+        for step in ...:
+            viz.update(state.ship, state.asteroids, d_threat)
     """
-    # Convert samples → time axis
-    n_samples = len(waves.left)
-    if max_duration_s is not None:
-        max_samples = int(max_duration_s * cfg.sampling_rate)
-        max_samples = min(max_samples, n_samples)
-    else:
-        max_samples = n_samples
-    
-    t = np.arange(max_samples) / cfg.sampling_rate
 
+    def __init__(self, max_dist: float = 400.0, theta_center_deg: float = 10.0):
+        self.max_dist = max_dist
+        self.theta_center_deg = theta_center_deg
+
+        self.fig, self.ax = plt.subplots(figsize=(7, 7))
+        ax = self.ax
+        ax.set_xlim(0, WORLD_WIDTH)
+        ax.set_ylim(0, WORLD_HEIGHT)
+        ax.set_aspect('equal')
+        ax.set_title("Asteroid Field Visualization")
+        ax.set_xlabel("X")
+        ax.set_ylabel("Y")
+        ax.grid(True)
+        ax.legend(handles=[_SHIP_LEGEND, _HEAD_LEGEND], loc='lower left')
+
+        # Moving artists: animated, so they stay out of the background
+        self.ship_poly = Polygon(np.zeros((3, 2)), closed=True, color="black", alpha=0.9, animated=True)
+        self.sector = Polygon(_center_sector(0.0, 0.0, 0.0, max_dist, theta_center_deg), closed=True,
+                              facecolor="lightgray", alpha=0.3, edgecolor=None, animated=True)
+        self.ast_collection = _asteroid_bodies(ax, np.zeros(0), np.zeros(0), np.zeros(0), animated=True)
+        self.arrows = None  # quiver, built on the first update (its length is fixed)
+        self.threat_text = ax.text(0.02, 0.98, "", transform=ax.transAxes, fontsize=12, va='top',
+                                   bbox=dict(facecolor='white', alpha=0.7), animated=True)
+        ax.add_patch(self.sector)
+        ax.add_patch(self.ship_poly)
+        ax.add_collection(self.ast_collection)
+
+        self.bg = None
+        # Resizes and full redraws invalidate the background: grab it again
+        self.fig.canvas.mpl_connect("draw_event", self._on_draw)
+        self.fig.canvas.draw()
+
+    def _artists(self) -> list:
+        artists = [self.sector, self.ast_collection, self.ship_poly, self.threat_text]
+        if self.arrows is not None:
+            artists.insert(2, self.arrows)
+        return artists
+
+    def _on_draw(self, event):
+        canvas = self.fig.canvas
+        if canvas.is_saving():
+            return  # savefig draws the animated artists itself
+        self.bg = canvas.copy_from_bbox(self.ax.bbox)
+        for artist in self._artists():
+            self.ax.draw_artist(artist)
+
+    def update(self, ship: Ship, asteroids, d_threat: Optional[Threat] = None):
+        """ Move the artists to the given game state and blit them."""
+        ax = self.ax
+        tri, sector = _ship_geometry(ship, self.max_dist, self.theta_center_deg)
+        self.ship_poly.set_xy(tri)
+        self.sector.set_xy(sector)
+
+        xs, ys, sizes, vxs, vys = _asteroid_columns(asteroids)
+        self.ast_collection.set_offsets(np.column_stack((xs, ys)))
+        self.ast_collection.set_widths(2 * sizes)
+        self.ast_collection.set_heights(2 * sizes)
+        if self.arrows is not None and self.arrows.N == len(xs):
+            self.arrows.set_offsets(np.column_stack((xs, ys)))
+            self.arrows.set_UVC(vxs * ARROW_SCALE, vys * ARROW_SCALE)
+        else:
+            if self.arrows is not None:
+                self.arrows.remove()
+            self.arrows = _velocity_arrows(ax, xs, ys, vxs, vys, animated=True)
+
+        if d_threat is not None:
+            self.threat_text.set_text(
+                f"Threats:\n"
+                f"Left   = {d_threat.left:.2f}\n"
+                f"Center = {d_threat.center:.2f}\n"
+                f"Right  = {d_threat.right:.2f}"
+            )
+        self.threat_text.set_visible(d_threat is not None)
+
+        canvas = self.fig.canvas
+        if self.bg is None or not canvas.supports_blit:
+            canvas.draw_idle()
+            return
+        canvas.restore_region(self.bg)
+        for artist in self._artists():
+            ax.draw_artist(artist)
+        canvas.blit(ax.bbox)
+        canvas.flush_events()
+
+
+def _decimate(y: np.ndarray, n_bins: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sample indices and values to plot for `y` on an axis n_bins pixels wide.
+    Samples inside flat runs are dropped first (exact: the line through
+    them is straight), which is all it takes for pulse trains. If more than
+    4 points per pixel are left, each of n_bins equal bins keeps only its
+    first, min, max and last sample (M4 decimation), in time order.
+    """
+    n = len(y)
+    if n <= 2:
+        return np.arange(n), y
+    change = y[1:] != y[:-1]
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    keep[1:] |= change   # first sample of a new value
+    keep[:-1] |= change  # last sample of the old one
+    idx = np.flatnonzero(keep)
+
+    per_bin = n // n_bins
+    if len(idx) <= 4 * n_bins or per_bin < 4:
+        return idx, y[idx]
+    n_used = per_bin * n_bins
+    blocks = y[:n_used].reshape(n_bins, per_bin)
+    offsets = np.arange(n_bins) * per_bin
+    idx = np.column_stack((
+        offsets,
+        offsets + blocks.argmin(axis=1),
+        offsets + blocks.argmax(axis=1),
+        offsets + per_bin - 1,
+    ))
+    idx.sort(axis=1)
+    idx = np.concatenate((idx.ravel(), np.arange(n_used, n)))  # leftover tail, < per_bin samples
+    return idx, y[idx]
+
+
+# Figures reused by plot_directional_stim(reuse=True):
+# (sampling_rate, max_duration_s) -> (figure, [left, center, right] lines)
+_STIM_FIGS = {}
+
+def _new_stim_figure():
+    """ Three stacked stim axes, with one empty line each."""
     fig, axes = plt.subplots(3, 1, figsize=(6, 5), sharex=True)
 
-    axes[0].plot(t, waves.left[:max_samples], color="red")
+    left_line, = axes[0].plot([], [], color="red")
     axes[0].set_title("Left stimulation")
     # axes[0].set_ylabel("Voltage (V)")
 
-    axes[1].plot(t, waves.center[:max_samples], color="green")
+    center_line, = axes[1].plot([], [], color="green")
     axes[1].set_title("Center stimulation")
     # axes[1].set_ylabel("Voltage (V)")
 
-    axes[2].plot(t, waves.right[:max_samples], color="blue")
+    right_line, = axes[2].plot([], [], color="blue")
     axes[2].set_title("Right stimulation")
     # axes[2].set_ylabel("Voltage (V)")
     axes[2].set_xlabel("Time (s)")
 
-    plt.tight_layout()
-    plt.show()
+    return fig, [left_line, center_line, right_line]
+
+def plot_directional_stim(waves, cfg: StimConfig, max_duration_s=None, save_path: Optional[str] = None,
+                          reuse: bool = False):
+    """
+    waves: DirectionalWaveforms(left, center, right)
+    cfg: StimConfig (for sampling rate)
+    max_duration_s: optional, plot only first N seconds
+    save_path: optional, save the figure there instead of showing it
+    reuse: update the lines of the still-open figure of the previous
+           reuse=True call with the same sampling rate and duration instead
+           of building a new figure (e.g. for an animation loop)
+    Long waveforms are decimated (flat runs, then min/max per pixel) before plotting.
+    """
+    # Convert samples → time axis
+    n_samples = len(waves.left)
+    if max_duration_s is not None:
+        max_samples = int(max_duration_s * cfg.sampling_rate)
+        max_samples = min(max_samples, n_samples)
+    else:
+        max_samples = n_samples
+
+    if not reuse:
+        fig, lines = _new_stim_figure()
+    else:
+        key = (cfg.sampling_rate, max_duration_s)
+        cached = _STIM_FIGS.get(key)
+        if cached is None or not plt.fignum_exists(cached[0].number):
+            cached = _STIM_FIGS[key] = _new_stim_figure()
+        fig, lines = cached
+
+    n_bins = int(fig.get_size_inches()[0] * fig.dpi)
+    for line, wave in zip(lines, (waves.left, waves.center, waves.right)):
+        idx, y = _decimate(wave[:max_samples], n_bins)
+        line.set_data(idx / cfg.sampling_rate, y)
+        line.axes.relim()
+        line.axes.autoscale_view()
+
+    fig.tight_layout()
+    fig.canvas.draw_idle()
+    _show_or_save(fig, save_path)